@@ -1,278 +1,1377 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError
+from urllib3.util import Retry, make_headers
 from bs4 import BeautifulSoup
+from bs4.element import Tag
+from bs4.filter import ElementFilter
+import soupsieve
 import pymongo
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from collections import Counter
 from datetime import datetime
+from urllib.parse import urljoin, urlparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from metrics import Metrics
+import related_index
+import argparse
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import queue
+import re
+import sqlite3
+import threading
 import time
 
-def scrape_article_content(url):
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        h1 = soup.find('h1', class_='entry-title')
-        article_title = h1.text.strip() if h1 else "Titre non trouvé"
-        
-        summary = ""
-        article_hat = soup.find('div', class_='article-hat')
-        if article_hat:
-            summary_p = article_hat.find('p')
-            if summary_p:
-                summary = summary_p.text.strip()
-                print(f"Résumé: {summary[:50]}...")
-        
-        author = "Auteur non spécifié"
-        publish_date = ""
-        publish_datetime = ""
-        
-        meta_info = soup.find('div', class_='meta-info')
-        if meta_info:
-            byline = meta_info.find('span', class_='byline')
-            if byline and byline.find('a'):
-                author = byline.find('a').text.strip()
-                print(f"Auteur: {author}")
-                
-            posted_on = meta_info.find('span', class_='posted-on')
-            if posted_on:
-                time_tag = posted_on.find('time')
-                if time_tag:
-                    publish_date = time_tag.text.strip()
-                    publish_datetime = time_tag.get('datetime', '')
-                    print(f"Date de publication: {publish_date}")
-        
-        images = []
-        figures = soup.find_all('figure')
+DEFAULT_WORKERS = 1
+DEFAULT_RATE = 1.0
+DEFAULT_PARSE_WORKERS = 0
+VERBOSE = True
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept-Encoding': make_headers(accept_encoding=True)['accept-encoding'],
+    'Connection': 'keep-alive'
+}
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+MAX_RETRIES = 4
+BACKOFF_FACTOR = 1
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+MONGO_URI = "mongodb://localhost:27017/"
+BATCH_SIZE = 500
+STATS_COLLECTION = "stats"
+STATS_MARKER = "__version__"
+STATS_VERSION = 1
+REVISIONS_COLLECTION = "revisions"
+FLUSH_INTERVAL = 10
+QUEUE_SIZE = 1000
+JOURNAL_PATH = ".crawl_journal.sqlite"
+MAX_ATTEMPTS = 3
+CACHE_DIR = ".http_cache"
+CACHE_MAX_MB = 100
+SITES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sites")
+DEFAULT_SITE = "blogdumoderateur"
+SITES = {}
+
+try:
+    import lxml
+    PARSER = 'lxml'
+except ImportError:
+    PARSER = 'html.parser'
+
+metrics = Metrics()
+
+def log(message):
+    if VERBOSE:
+        print(message)
+
+def record_outcome(link, outcome, category_name=None, error=None):
+    metrics.inc('scraper_articles_total', outcome=outcome)
+    metrics.event('article', url=link, outcome=outcome, category=category_name, error=error)
+
+class TagFilter(ElementFilter):
+    def __init__(self, keep):
+        super().__init__()
+        self.keep = keep
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        classes = (attrs or {}).get('class') or ''
+        if isinstance(classes, str):
+            classes = classes.split()
+        return self.keep(name, set(classes))
+
+    def allow_string_creation(self, string):
+        return False
+
+def parse_html(content, keep=None):
+    parse_only = TagFilter(keep) if keep else None
+    return BeautifulSoup(content, PARSER, parse_only=parse_only)
+
+SIMPLE_SELECTOR = re.compile(r'^([\w-]+)?((?:\.[\w-]+)*)$')
+
+def compound_parts(token):
+    match = SIMPLE_SELECTOR.match(token)
+    if not match:
+        return None
+    tag = match.group(1).lower() if match.group(1) else None
+    return tag, set(filter(None, match.group(2).split('.')))
+
+def selector_parts(css):
+    parts = [compound_parts(token) for token in css.split()]
+    if ',' in css or parts[-1] is None:
+        return None, set(), None
+    tag, classes = parts[-1]
+    ancestors = parts[:-1] if None not in parts else None
+    return tag, classes, ancestors
+
+def matches_ancestors(element, ancestors):
+    parent = element.parent
+    for tag, classes in reversed(ancestors):
+        while parent is not None and not (
+            (tag is None or parent.name == tag) and classes.issubset(parent.get('class') or ())
+        ):
+            parent = parent.parent
+        if parent is None:
+            return False
+        parent = parent.parent
+    return True
+
+def root_selectors(fields):
+    roots = set()
+    for rule in fields.values():
+        if 'css' not in rule:
+            return None
+        if rule.get('scan'):
+            continue
+        for css in rule['css'].split(','):
+            match = SIMPLE_SELECTOR.match(css.split()[0])
+            if not match:
+                return None
+            tag = match.group(1).lower() if match.group(1) else None
+            roots.add((tag, frozenset(filter(None, match.group(2).split('.')))))
+    return roots
+
+TAG_ATTRIBUTE = re.compile(r'''([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?''')
+
+def parse_attributes(text):
+    attrs = {}
+    for name, double, single, bare in TAG_ATTRIBUTE.findall(text):
+        name = name.lower()
+        if name not in attrs:
+            value = double or single or bare
+            attrs[name] = html.unescape(value) if '&' in value else value
+    return attrs
+
+class ScannedTag:
+    descendants = ()
+    text = ''
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+class RawScanner:
+    def __init__(self, css):
+        tag, classes, ancestors = selector_parts(css)
+        if tag is None or not ancestors or len(ancestors) != 1 or ancestors[0][0] is None:
+            raise ValueError(f"Sélecteur non pris en charge par scan: {css}")
+        self.tag = tag
+        self.classes = classes
+        self.container, self.container_classes = ancestors[0]
+        names = "|".join(sorted({re.escape(tag), re.escape(self.container)}))
+        self.pattern = re.compile(
+            r'<!--.*?-->|<(script|style)\b.*?</\1\s*>|<(/?)(' + names + r')(?=[\s/>])([^>]*)>',
+            re.S | re.I
+        )
+
+    def scan(self, content):
+        if isinstance(content, bytes):
+            content = content.decode('utf-8', errors='replace')
+        found = []
+        depth = 0
+        for _, closing, name, text in self.pattern.findall(content):
+            if not name:
+                continue
+            name = name.lower()
+            if name == self.tag and not closing and depth:
+                attrs = parse_attributes(text)
+                if self.classes <= set(attrs.get('class', '').split()):
+                    found.append(ScannedTag(name, attrs))
+            if name != self.container:
+                continue
+            if closing:
+                depth = max(depth - 1, 0)
+            elif depth:
+                depth += 1
+            elif all(name in text for name in self.container_classes) and \
+                    self.container_classes <= set(parse_attributes(text).get('class', '').split()):
+                depth = 1
+        return found
+
+def read_value(element, rule):
+    if 'format' in rule:
+        try:
+            return rule['format'].format_map(element.attrs)
+        except KeyError:
+            return None
+    attrs = rule.get('attr')
+    if attrs is None:
+        return element.text.strip()
+    if isinstance(attrs, str):
+        return element.get(attrs)
+    for attr in attrs:
+        value = element.get(attr)
+        if value:
+            return value
+    return None
+
+class ExtractionSchema:
+    def __init__(self, fields):
+        self.fields = {}
+        self.selectors = {}
+        self.filters = {}
+        self.many = set()
+        self.scanners = {}
+        by_tag = {}
+        for name, rule in fields.items():
+            rule = dict(rule)
+            if 'fields' in rule:
+                rule['schema'] = ExtractionSchema(rule['fields'])
+            if 'css' in rule:
+                if rule['css'] not in self.selectors:
+                    tag, classes, ancestors = selector_parts(rule['css'])
+                    self.selectors[rule['css']] = soupsieve.compile(rule['css'])
+                    self.filters[rule['css']] = (classes, ancestors)
+                    by_tag.setdefault(tag, []).append(rule['css'])
+                if rule.get('many'):
+                    self.many.add(rule['css'])
+                if rule.get('scan'):
+                    self.scanners[rule['css']] = RawScanner(rule['css'])
+            self.fields[name] = rule
         
-        for i, figure in enumerate(figures):
-            image_data = {}
-            
-            img_tag = figure.find('img')
-            if img_tag:
-                image_url = img_tag.get('data-lazy-src') or img_tag.get('src')
-                if image_url:
-                    image_data['url'] = image_url
-                    image_data['alt'] = img_tag.get('alt', '')
-                    
-                    width = img_tag.get('width')
-                    height = img_tag.get('height')
-                    if width and height:
-                        image_data['dimensions'] = f"{width}x{height}"
+        self.wildcard = by_tag.pop(None, [])
+        self.by_tag = {tag: selectors + self.wildcard for tag, selectors in by_tag.items()}
+        self.roots = root_selectors(fields)
+
+    def keep(self, name, classes):
+        return any((tag is None or tag == name) and root_classes <= classes for tag, root_classes in self.roots)
+
+    def parse(self, content):
+        return parse_html(content, self.keep if self.roots is not None else None)
+
+    def scan(self, content):
+        return {css: scanner.scan(content) for css, scanner in self.scanners.items()}
+
+    def match(self, root, scanned=None):
+        matches = {css: [] for css in self.selectors}
+        for element in root.descendants:
+            if not isinstance(element, Tag):
+                continue
+            for css in self.by_tag.get(element.name, self.wildcard):
+                if matches[css] and css not in self.many:
+                    continue
+                classes, ancestors = self.filters[css]
+                if classes and not classes.issubset(element.get('class') or ()):
+                    continue
+                if ancestors is None:
+                    if not self.selectors[css].match(element):
+                        continue
+                elif ancestors and not matches_ancestors(element, ancestors):
+                    continue
+                matches[css].append(element)
+        if scanned:
+            matches.update(scanned)
+        return matches
+
+    def extract(self, root, missing=None, scanned=None):
+        matches = self.match(root, scanned)
+        record = {}
+        for name, rule in self.fields.items():
+            if rule.get('many'):
+                records = (rule['schema'].extract(element) for element in matches[rule['css']])
+                record[name] = [item for item in records if item]
+                continue
+            if rule.get('requires') and rule['requires'] not in record:
+                continue
             
-            a_tag = figure.find('a', class_='lightbox')
-            if a_tag:
-                image_data['full_size_url'] = a_tag.get('href')
+            if 'schema' in rule:
+                target = matches[rule['css']][0] if matches[rule['css']] else None
+                values = rule['schema'].extract(target, missing) if target is not None else {}
+                if not values and rule.get('required'):
+                    return {}
+                record.update(values)
+                continue
             
-            figcaption = figure.find('figcaption')
-            if figcaption:
-                image_data['caption'] = figcaption.text.strip()
+            target = root
+            if 'css' in rule:
+                target = matches[rule['css']][0] if matches[rule['css']] else None
             
-            if image_data:
-                print(f"Image {i+1} trouvée" + (f": {image_data.get('caption', '')[:30]}..." if 'caption' in image_data else ""))
-                images.append(image_data)
-        
-        main_category = ""
-        tags = []
-        article_terms = soup.find('div', class_='article-terms')
-        
-        if article_terms:
-            cats_list = article_terms.find('div', class_='cats-list')
-            if cats_list:
-                cat_span = cats_list.find('span', class_='cat')
-                if cat_span and cat_span.has_attr('data-cat'):
-                    main_category = cat_span['data-cat']
-                    print(f"Catégorie principale: {main_category}")
-                    
-            tags_list = article_terms.find('ul', class_='tags-list')
-            if tags_list:
-                tag_links = tags_list.find_all('a', class_='post-tags')
-                
-                for tag in tag_links:
-                    tag_name = tag.text.strip()
-                    tag_url = tag.get('href')
-                    tag_id = tag.get('data-tag')
-                    
-                    print(f"Tag: {tag_name} (ID: {tag_id})")
-                    
-                    tags.append({
-                        'name': tag_name,
-                        'url': tag_url,
-                        'data_tag': tag_id
-                    })
-        
-        return {
-            'detailed_title': article_title,
-            'summary': summary,
-            'author': author,
-            'publish_date': publish_date,
-            'publish_datetime': publish_datetime,
-            'main_category': main_category,
-            'tags': tags,
-            'images': images
-        }
+            value = read_value(target, rule) if target is not None else None
+            if value is None and missing is not None:
+                missing.append(name)
+            if value is None and 'default' in rule:
+                value = rule['default']
+            if value is not None or 'default' in rule:
+                record[name] = value
+            elif rule.get('required'):
+                return {}
+        return record
+
+class Site:
+    def __init__(self, config):
+        self.config = config
+        self.name = config['name']
+        self.title = config.get('title', self.name)
+        self.categories = config['categories']
+        self.pagination = config.get('pagination', "{url}page/{page}/")
+        self.rate = config.get('rate', DEFAULT_RATE)
+        self.article_pattern = re.compile(config['article_pattern']) if config.get('article_pattern') else None
+        self.category_urls = {category['url'] for category in self.categories}
+        self.article_schema = ExtractionSchema(config['article_schema'])
+        self.listing_schema = ExtractionSchema(config['listing_schema'])
+
+    def hosts(self):
+        return {urlparse(category['url']).netloc for category in self.categories}
+
+    def internal_links(self, page_url, hrefs):
+        hosts = self.hosts()
+        links = []
+        for href in hrefs:
+            url = urljoin(page_url, href).split('#')[0]
+            if url == page_url or url in self.category_urls or urlparse(url).netloc not in hosts:
+                continue
+            if self.article_pattern and not self.article_pattern.match(url):
+                continue
+            links.append(url)
+        return list(dict.fromkeys(links))
+
+    def page_url(self, category_url, page):
+        if page == 1:
+            return category_url
+        return self.pagination.format(url=category_url.rstrip('/') + '/', page=page)
+
+def load_site(path):
+    with open(path, encoding="utf-8") as f:
+        return register_site(json.load(f))
+
+def register_site(config):
+    site = Site(config)
+    SITES[site.name] = site
+    return site
+
+def load_sites(names=None):
+    if not names:
+        names = sorted(name for name in os.listdir(SITES_DIR) if name.endswith(".json"))
+    sites = []
+    for name in names:
+        if name in SITES:
+            sites.append(SITES[name])
+            continue
+        path = name if os.path.exists(name) else os.path.join(SITES_DIR, name if name.endswith(".json") else name + ".json")
+        sites.append(load_site(path))
+    return sites
+
+def get_site(site=None):
+    if site is None:
+        site = DEFAULT_SITE
+    if isinstance(site, Site):
+        return site
+    return SITES[site] if site in SITES else load_sites([site])[0]
+
+class RateLimiter:
+    def __init__(self, rate=DEFAULT_RATE, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.rates = {}
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def set_rate(self, host, rate):
+        self.rates[host] = rate
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        rate = self.rates.get(host, self.rate)
+        if not rate or rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                tokens, last = self.buckets.get(host, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last) * rate)
+                if tokens >= 1:
+                    self.buckets[host] = (tokens - 1, now)
+                    return
+                self.buckets[host] = (tokens, now)
+                delay = (1 - tokens) / rate
+            time.sleep(delay)
+
+rate_limiter = RateLimiter()
+
+class FetchStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.latencies = []
+
+    def record(self, latency, retries, error=False):
+        with self.lock:
+            self.requests += 1
+            self.retries += retries
+            self.errors += 1 if error else 0
+            self.latencies.append(latency)
+
+    def summary(self):
+        with self.lock:
+            if not self.latencies:
+                return "Aucune requête effectuée"
+            latencies = sorted(self.latencies)
+            average = sum(latencies) / len(latencies)
+            median = latencies[len(latencies) // 2]
+            return (f"{self.requests} requêtes, {self.retries} retries, {self.errors} erreurs, "
+                    f"latence moyenne {average:.2f}s, médiane {median:.2f}s, max {latencies[-1]:.2f}s")
+
+fetch_stats = FetchStats()
+
+CACHE_ENTRY = re.compile(r'^[0-9a-f]{40}\.(json|body)$')
+
+class HttpCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total = None
+
+    def path(self, url):
+        key = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self.directory, f"{key}.json")
+
+    def validators(self, url):
+        try:
+            with open(self.path(url), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        data = json.dumps({'url': url, 'etag': etag, 'last_modified': last_modified}).encode()
+        path = self.path(url)
+        with self.lock:
+            if self.total is None:
+                self.total = self.scan()
+            try:
+                self.total -= os.path.getsize(path)
+            except OSError:
+                pass
+            with open(path, "wb") as f:
+                f.write(data)
+            self.total += len(data)
+            if self.total > self.max_bytes:
+                self.evict()
+
+    def entries(self):
+        for entry in os.scandir(self.directory):
+            match = CACHE_ENTRY.match(entry.name)
+            if match and entry.is_file():
+                yield match.group(1), entry
+
+    def scan(self):
+        os.makedirs(self.directory, exist_ok=True)
+        total = 0
+        for extension, entry in self.entries():
+            if extension == "body":
+                os.remove(entry.path)
+            else:
+                total += entry.stat().st_size
+        return total
+
+    def evict(self):
+        files = []
+        for extension, entry in self.entries():
+            if extension == "json":
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        self.total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if self.total <= self.max_bytes * 0.9:
+                break
+            os.remove(path)
+            self.total -= size
+
+http_cache = HttpCache()
+
+def encode_journal_data(data):
+    return json.dumps(data, default=lambda value: value.isoformat())
+
+def decode_journal_data(text):
+    data = json.loads(text)
+    if isinstance(data, dict) and 'date_scraped' in data:
+        data['date_scraped'] = datetime.fromisoformat(data['date_scraped'])
+    return data
+
+class CrawlJournal:
+    def __init__(self, path=JOURNAL_PATH, resume=False):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                data TEXT,
+                error TEXT,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        if not resume:
+            self.connection.execute("DELETE FROM urls")
+        self.connection.commit()
+
+    def get(self, url):
+        with self.lock:
+            row = self.connection.execute("SELECT state, data FROM urls WHERE url = ?", (url,)).fetchone()
+        if not row:
+            return None, None
+        state, data = row
+        return state, decode_journal_data(data) if data else None
+
+    def mark(self, url, state, data=None, error=None, kind='article'):
+        with self.lock:
+            self.connection.execute("""
+                INSERT INTO urls (url, kind, state, attempts, data, error, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    state = excluded.state,
+                    attempts = urls.attempts + excluded.attempts,
+                    data = COALESCE(excluded.data, urls.data),
+                    error = excluded.error,
+                    updated_at = excluded.updated_at
+            """, (url, kind, state, 1 if state == 'failed' else 0,
+                  encode_journal_data(data) if data is not None else None,
+                  error, datetime.now().isoformat()))
+            self.connection.commit()
+
+    def mark_stored(self, links):
+        with self.lock:
+            self.connection.executemany(
+                "UPDATE urls SET state = 'stored', data = NULL, updated_at = ? WHERE url = ?",
+                [(datetime.now().isoformat(), link) for link in links]
+            )
+            self.connection.commit()
+
+    def failed(self, max_attempts=MAX_ATTEMPTS):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT url, data FROM urls WHERE kind = 'article' AND state = 'failed' AND attempts < ?",
+                (max_attempts,)
+            ).fetchall()
+        return [(url, decode_journal_data(data)) for url, data in rows if data]
+
+    def summary(self):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT state, COUNT(*) FROM urls WHERE kind = 'article' GROUP BY state"
+            ).fetchall()
+        return ", ".join(f"{state}: {count}" for state, count in rows) or "vide"
+
+def build_session(pool_size=10):
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=("GET", "HEAD"),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+session = build_session()
+
+def exception_retries(error):
+    reason = error.args[0] if error.args else None
+    return MAX_RETRIES if isinstance(reason, MaxRetryError) else 0
+
+def fetch(url, conditional=False, cache=False):
+    headers = http_cache.validators(url) if conditional else {}
+    rate_limiter.wait(url)
+    start = time.perf_counter()
+    try:
+        response = session.get(url, headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    except requests.RequestException as e:
+        latency = time.perf_counter() - start
+        retries = exception_retries(e)
+        fetch_stats.record(latency, retries, error=True)
+        metrics.observe('scraper_stage_seconds', latency, stage='fetch')
+        metrics.inc('scraper_http_responses_total', status='error')
+        metrics.inc('scraper_http_retries_total', retries)
+        metrics.event('fetch', url=url, status=None, seconds=round(latency, 4), retries=retries, error=str(e))
+        raise
+    latency = time.perf_counter() - start
+    retry_state = getattr(response.raw, 'retries', None)
+    retries = len(retry_state.history) if retry_state else 0
+    size = len(response.content)
+    fetch_stats.record(latency, retries, error=not response.ok)
+    metrics.observe('scraper_stage_seconds', latency, stage='fetch')
+    metrics.inc('scraper_http_responses_total', status=response.status_code)
+    metrics.inc('scraper_http_retries_total', retries)
+    metrics.inc('scraper_response_bytes_total', size)
+    metrics.event('fetch', url=url, status=response.status_code, bytes=size, seconds=round(latency, 4), retries=retries)
+    log(f"GET {url} -> {response.status_code} en {latency:.2f}s ({retries} retries)")
+    response.raise_for_status()
+    if cache and response.status_code == 200:
+        http_cache.store(url, response)
+    return response
+
+parse_pool = None
+
+def init_parse_worker(parser, configs):
+    global PARSER
+    PARSER = parser
+    for config in configs:
+        register_site(config)
+
+def start_parse_pool(workers):
+    global parse_pool
+    if workers > 0:
+        parse_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_parse_worker,
+            initargs=(PARSER, [site.config for site in SITES.values()])
+        )
+    return parse_pool
+
+def stop_parse_pool():
+    global parse_pool
+    if parse_pool:
+        parse_pool.shutdown()
+        parse_pool = None
+
+def parse_article_content(content, site_name=DEFAULT_SITE):
+    schema = get_site(site_name).article_schema
+    start = time.perf_counter()
+    soup = schema.parse(content)
+    scanned = schema.scan(content)
+    parsed = time.perf_counter()
+    missing = []
+    article = schema.extract(soup, missing, scanned)
+    return article, missing, parsed - start, time.perf_counter() - parsed
+
+def parse_article_page(content, site=None):
+    site = get_site(site)
+    if parse_pool:
+        result = parse_pool.submit(parse_article_content, content, site.name).result()
+    else:
+        result = parse_article_content(content, site.name)
+    article, missing, parse_seconds, extract_seconds = result
+    metrics.observe('scraper_stage_seconds', parse_seconds, stage='parse', page='article')
+    metrics.observe('scraper_stage_seconds', extract_seconds, stage='extract', page='article')
+    report_article(article, missing)
+    return article
+
+def extract_article(soup, site=None, scanned=None):
+    missing = []
+    with metrics.timer('scraper_stage_seconds', stage='extract', page='article'):
+        article = get_site(site).article_schema.extract(soup, missing, scanned)
+    report_article(article, missing)
+    return article
+
+def report_article(article, missing):
+    for field in missing:
+        metrics.inc('scraper_missing_fields_total', field=field)
+    log(f"Article extrait: {article['detailed_title'][:50]} ({article['author']}, "
+          f"{len(article['images'])} images, {len(article['tags'])} tags)")
+
+def error_article():
+    return {
+        'detailed_title': "Erreur de récupération", 
+        'summary': "",
+        'author': "",
+        'publish_date': "",
+        'publish_datetime': "",
+        'main_category': "", 
+        'tags': [],
+        'images': []
+    }
+
+def try_scrape_article(url, conditional=False, journal=None, site=None):
+    try:
+        response = fetch(url, conditional, cache=True)
+        if response.status_code == 304:
+            log(f"Article inchangé (304): {url}")
+            return None, None
+        if journal:
+            journal.mark(url, 'fetched')
+        return parse_article_page(response.content, site), None
         
     except Exception as e:
         print(f"Erreur lors du scraping de l'article {url}: {e}")
-        return {
-            'detailed_title': "Erreur de récupération", 
-            'summary': "",
-            'author': "",
-            'publish_date': "",
-            'publish_datetime': "",
-            'main_category': "", 
-            'tags': [],
-            'images': []
-        }
+        return None, str(e)
+
+def scrape_article_content(url, conditional=False, site=None):
+    article_details, error = try_scrape_article(url, conditional, site=site)
+    return error_article() if error else article_details
+
+HASHED_FIELDS = [
+    'list_title', 'thumbnail', 'page_title', 'summary', 'author',
+    'publish_date', 'publish_datetime', 'tags', 'images', 'internal_links'
+]
+
+def hashed_content(article):
+    content = {field: article.get(field) for field in HASHED_FIELDS}
+    if not content['internal_links']:
+        del content['internal_links']
+    return content
+
+def content_hash(article):
+    content = hashed_content(article)
+    encoded = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+def diff_articles(old, new):
+    changes = {}
+    old, new = hashed_content(old), hashed_content(new)
+    for field in HASHED_FIELDS:
+        before, after = old.get(field), new.get(field)
+        if field == 'internal_links':
+            before, after = before or [], after or []
+        if before == after:
+            continue
+        if isinstance(before, list) and isinstance(after, list):
+            added = [item for item in after if item not in before]
+            removed = [item for item in before if item not in after]
+            changes[field] = {'added': added, 'removed': removed} if added or removed else {'reordered': True}
+        else:
+            changes[field] = {'old': before, 'new': after}
+    return changes
+
+def build_record(entry, article_details, category_name, category_url, site=None):
+    site = get_site(site)
+    hrefs = [link['url'] for link in article_details.get('links', [])]
+    record = {
+        'source': site.name,
+        'list_title': entry['title'],
+        'link': entry['link'],
+        'thumbnail': entry['thumbnail'],
+        'page_title': article_details['detailed_title'],
+        'summary': article_details['summary'],
+        'author': article_details['author'],
+        'publish_date': article_details['publish_date'],
+        'publish_datetime': article_details['publish_datetime'],
+        'main_category': category_name, 
+        'category_url': category_url, 
+        'tags': article_details['tags'],
+        'images': article_details['images'],
+        'internal_links': site.internal_links(entry['link'], hrefs),
+        'date_scraped': datetime.now()
+    }
+    record['content_hash'] = content_hash(record)
+    return record
     
-def scrape_category_articles(category_url, category_name):
+def parse_category_page(content, site=None):
+    schema = get_site(site).listing_schema
+    with metrics.timer('scraper_stage_seconds', stage='parse', page='listing'):
+        soup = schema.parse(content)
+    with metrics.timer('scraper_stage_seconds', stage='extract', page='listing'):
+        return schema.extract(soup)['entries']
+
+def is_before(publish_datetime, since):
+    if not since or not publish_datetime:
+        return False
     try:
-        print(f"\nScraping catégorie: {category_name} ({category_url})")
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.get(category_url, headers=headers)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
+        return datetime.fromisoformat(publish_datetime).date() < since
+    except ValueError:
+        return False
+
+def iter_category_articles(category_url, category_name, workers=DEFAULT_WORKERS, known=None, max_pages=1, since=None, journal=None, site=None):
+    site = get_site(site)
+    print(f"\nScraping catégorie: {category_name} ({category_url})")
+    page = 1
+    
+    while not max_pages or page <= max_pages:
+        page_url = site.page_url(category_url, page)
+        state, entries = journal.get(page_url) if journal else (None, None)
+        if state == 'parsed':
+            print(f"Page {page} de {category_name} reprise depuis le journal")
+        else:
+            try:
+                response = fetch(page_url)
+                entries = parse_category_page(response.content, site)
+            except requests.HTTPError as e:
+                if e.response is not None and e.response.status_code == 404:
+                    print(f"Fin de la pagination de {category_name} à la page {page}")
+                else:
+                    print(f"Erreur {category_name} (page {page}): {e}")
+                return
+            except Exception as e:
+                print(f"Erreur {category_name} (page {page}): {e}")
+                return
+            if journal:
+                journal.mark(page_url, 'parsed', entries, kind='listing')
         
-        articles = soup.find_all('article', class_='post')
-        data = []
+        print(f"Nombre d'articles trouvés dans la catégorie {category_name} (page {page}): {len(entries)}")
+        if not entries:
+            return
         
-        print(f"Nombre d'articles trouvés dans la catégorie {category_name}: {len(articles)}")
+        if known is not None and all(entry['link'] in known for entry in entries):
+            print(f"Tous les articles de la page {page} sont déjà stockés, arrêt de {category_name}")
+            return
         
-        for article in articles:
-            header = article.find('header', class_='entry-header')
-            if not header:
-                continue
-                
-            link_tag = header.find('a')
-            if not link_tag:
+        pending = []
+        for entry in entries:
+            log(f"Article trouvé: {entry['title']}")
+            if entry['thumbnail']:
+                log(f"Thumbnail: {entry['thumbnail']}")
+            
+            if known is not None and entry['link'] in known and entry['listed_datetime'] == known[entry['link']]:
+                log(f"Article déjà à jour: {entry['title']}")
+                record_outcome(entry['link'], 'unchanged', category_name)
                 continue
-                
-            link = link_tag.get('href')
-            h3 = link_tag.find('h3', class_='entry-title')
-            if not h3:
+            if is_before(entry['listed_datetime'], since):
                 continue
-                
-            title = h3.text.strip()
-            
-            thumbnail_url = None
-            thumbnail_div = article.find('div', class_='post-thumbnail')
-            if thumbnail_div:
-                img_tag = thumbnail_div.find('img')
-                if img_tag:
-                    thumbnail_url = img_tag.get('data-lazy-src') or img_tag.get('src')
-            
-            print(f"Article trouvé: {title}")
-            if thumbnail_url:
-                print(f"Thumbnail: {thumbnail_url}")
             
-            print(f"Récupération des détails de l'article: {link}")
+            if journal:
+                state, record = journal.get(entry['link'])
+                if state in ('stored', 'skipped'):
+                    log(f"Article déjà traité lors d'une exécution précédente: {entry['title']}")
+                    continue
+                if state == 'parsed':
+                    yield record
+                    continue
+                if state == 'failed':
+                    continue
+                journal.mark(entry['link'], 'discovered', {
+                    'entry': entry,
+                    'site': site.name,
+                    'category_name': category_name,
+                    'category_url': category_url
+                })
             
-            article_details = scrape_article_content(link)
-            
-            time.sleep(1)
+            pending.append(entry)
+        
+        log(f"Récupération des détails de {len(pending)} articles ({workers} workers)")
+        metrics.set('scraper_fetch_pending', len(pending))
+        links = [entry['link'] for entry in pending]
+        conditional = [known is not None and link in known for link in links]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            results = executor.map(try_scrape_article, links, conditional, [journal] * len(links), [site] * len(links))
             
-            data.append({
-                'list_title': title,
-                'link': link,
-                'thumbnail': thumbnail_url,
-                'page_title': article_details['detailed_title'],
-                'summary': article_details['summary'],
-                'author': article_details['author'],
-                'publish_date': article_details['publish_date'],
-                'publish_datetime': article_details['publish_datetime'],
-                'main_category': category_name, 
-                'category_url': category_url, 
-                'tags': article_details['tags'],
-                'images': article_details['images'],
-                'date_scraped': datetime.now()
-            })
+            reached_cutoff = any(is_before(entry['listed_datetime'], since) for entry in entries)
+            for entry, (article_details, error) in zip(pending, results):
+                if error:
+                    record_outcome(entry['link'], 'failed', category_name, error)
+                    if journal:
+                        journal.mark(entry['link'], 'failed', error=error)
+                        continue
+                    article_details = error_article()
+                if article_details is None:
+                    record_outcome(entry['link'], 'unchanged', category_name)
+                    if journal:
+                        journal.mark(entry['link'], 'skipped')
+                    continue
+                if known is not None and known.get(entry['link']) and article_details['publish_datetime'] == known[entry['link']]:
+                    log(f"Article déjà à jour: {entry['title']}")
+                    record_outcome(entry['link'], 'unchanged', category_name)
+                    if journal:
+                        journal.mark(entry['link'], 'skipped')
+                    continue
+                if is_before(article_details['publish_datetime'], since):
+                    reached_cutoff = True
+                    record_outcome(entry['link'], 'skipped', category_name)
+                    if journal:
+                        journal.mark(entry['link'], 'skipped')
+                    continue
+                
+                if not error:
+                    record_outcome(entry['link'], 'parsed', category_name)
+                record = build_record(entry, article_details, category_name, category_url, site)
+                if journal:
+                    journal.mark(entry['link'], 'parsed', record)
+                yield record
         
-        print(f"Nb articles dans catégorie {category_name}: {len(data)}")
-        return data
-    
-    except Exception as e:
-        print(f"Erreur {category_name}: {e}")
-        return []
-
-def scrape_all_categories():
-    categories = [
-        {"name": "Web", "url": "https://www.blogdumoderateur.com/web/"},
-        {"name": "Marketing", "url": "https://www.blogdumoderateur.com/marketing/"},
-        {"name": "Social", "url": "https://www.blogdumoderateur.com/social/"},
-        {"name": "Tech", "url": "https://www.blogdumoderateur.com/tech/"},
-        {"name": "Tools", "url": "https://www.blogdumoderateur.com/tools/"}
-    ]
-    
-    all_articles = []
+        if reached_cutoff:
+            print(f"Date limite {since} atteinte pour {category_name}")
+            return
+        page += 1
+
+def retry_failed_articles(journal, workers=DEFAULT_WORKERS):
+    failed = journal.failed(MAX_ATTEMPTS)
+    if not failed:
+        return
     
-    for category in categories:
+    print(f"\nNouvelle tentative pour {len(failed)} articles en échec")
+    links = [url for url, _ in failed]
+    sites = [get_site(context.get('site')) for _, context in failed]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = executor.map(try_scrape_article, links, [False] * len(links), [journal] * len(links), sites)
+        for (url, context), site, (article_details, error) in zip(failed, sites, results):
+            if error or article_details is None:
+                record_outcome(url, 'failed', context['category_name'], error)
+                journal.mark(url, 'failed', error=error)
+                continue
+            record_outcome(url, 'parsed', context['category_name'])
+            record = build_record(context['entry'], article_details, context['category_name'], context['category_url'], site)
+            journal.mark(url, 'parsed', record)
+            yield record
+
+def scrape_category_articles(category_url, category_name, workers=DEFAULT_WORKERS, known=None, max_pages=1, since=None, journal=None, site=None):
+    data = list(iter_category_articles(category_url, category_name, workers, known, max_pages, since, journal, site))
+    print(f"Nb articles dans catégorie {category_name}: {len(data)}")
+    return data
+
+def iter_site_articles(site, workers=DEFAULT_WORKERS, known=None, max_pages=1, since=None, journal=None):
+    for category in site.categories:
         print(f"\n{'='*60}")
-        print(f"CATÉGORIE: {category['name'].upper()}")
+        print(f"{site.title.upper()} - CATÉGORIE: {category['name'].upper()}")
         print(f"{'='*60}")
         
-        category_articles = scrape_category_articles(category["url"], category["name"])
-        all_articles.extend(category_articles)
+        yield from iter_category_articles(category["url"], category["name"], workers, known, max_pages, since, journal, site)
+
+def iter_all_sites(sites=None, workers=DEFAULT_WORKERS, known=None, max_pages=1, since=None, journal=None):
+    sites = sites or [get_site()]
+    if len(sites) == 1:
+        yield from iter_site_articles(sites[0], workers, known, max_pages, since, journal)
+    else:
+        results = queue.Queue(maxsize=QUEUE_SIZE)
+        done = object()
+        
+        def crawl(site):
+            try:
+                for record in iter_site_articles(site, workers, known, max_pages, since, journal):
+                    results.put(record)
+            except Exception as e:
+                print(f"Erreur lors du scraping du site {site.name}: {e}")
+            finally:
+                results.put(done)
         
-        print(f"Pause de 2 secondes avant la prochaine catégorie...")
-        time.sleep(2)
+        for site in sites:
+            threading.Thread(target=crawl, args=(site,), name=f"crawl-{site.name}", daemon=True).start()
+        remaining = len(sites)
+        while remaining:
+            record = results.get()
+            if record is done:
+                remaining -= 1
+            else:
+                yield record
     
-    return all_articles
+    if journal:
+        yield from retry_failed_articles(journal, workers)
+
+def scrape_all_sites(sites=None, workers=DEFAULT_WORKERS, known=None, max_pages=1, since=None, journal=None):
+    return list(iter_all_sites(sites, workers, known, max_pages, since, journal))
+
+def scrape_all_categories(workers=DEFAULT_WORKERS, known=None, max_pages=1, since=None, journal=None):
+    return scrape_all_sites([get_site()], workers, known, max_pages, since, journal)
+
+def get_collection():
+    client = pymongo.MongoClient(MONGO_URI)
+    db = client["blog_scraper"]
+    return db["articles"]
+
+def load_known_articles():
+    try:
+        collection = get_collection()
+        return {
+            doc['link']: doc.get('publish_datetime', '')
+            for doc in collection.find({}, {'link': 1, 'publish_datetime': 1, '_id': 0})
+        }
+    except Exception as e:
+        print(f"Impossible de charger les articles existants: {e}")
+        return {}
+
+def ensure_indexes(collection):
+    collection.create_index("link", unique=True)
+    collection.create_index("source")
+    collection.create_index("main_category")
+    collection.create_index("author")
+    collection.create_index("publish_datetime")
+    collection.create_index("date_scraped")
+    collection.create_index([("main_category", 1), ("publish_datetime", -1)])
+    collection.database[STATS_COLLECTION].create_index([("kind", 1), ("count", -1)])
+    collection.database[REVISIONS_COLLECTION].create_index([("link", 1), ("revised_at", -1)])
+    ensure_stats(collection)
 
-def store_in_mongodb(data):
+def publication_week(publish_datetime):
     try:
-        client = pymongo.MongoClient("mongodb://localhost:27017/")
-        db = client["blog_scraper"]
-        collection = db["articles"]
+        year, week, _ = datetime.fromisoformat(publish_datetime).isocalendar()
+    except (TypeError, ValueError):
+        return None
+    return f"{year}-W{week:02d}"
+
+def stats_keys(article):
+    keys = []
+    if article.get('main_category'):
+        keys.append(('category', article['main_category']))
+    if article.get('author'):
+        keys.append(('author', article['author']))
+    for tag in article.get('tags') or []:
+        if tag.get('name'):
+            keys.append(('tag', tag['name']))
+    week = publication_week(article.get('publish_datetime'))
+    if week:
+        keys.append(('week', week))
+    return list(dict.fromkeys(keys))
+
+def write_stats(stats, deltas):
+    operations = [
+        UpdateOne({'_id': f"{kind}:{key}"}, {'$inc': {'count': delta}, '$set': {'kind': kind, 'key': key}}, upsert=True)
+        for (kind, key), delta in deltas.items() if delta
+    ]
+    if operations:
+        stats.bulk_write(operations, ordered=False)
+        stats.delete_many({'count': {'$lte': 0}})
+
+def update_stats(collection, previous, batch, stored_links):
+    stored = set(stored_links)
+    deltas = Counter()
+    for article in batch:
+        if article['link'] not in stored:
+            continue
+        deltas.subtract(stats_keys(previous.get(article['link'], {})))
+        deltas.update(stats_keys(article))
+        previous[article['link']] = article
+    write_stats(collection.database[STATS_COLLECTION], deltas)
+
+def rebuild_stats(collection):
+    projection = {'_id': 0, 'main_category': 1, 'author': 1, 'tags.name': 1, 'publish_datetime': 1}
+    totals = Counter()
+    for article in collection.find({}, projection):
+        totals.update(stats_keys(article))
+    
+    stats = collection.database[STATS_COLLECTION]
+    stats.delete_many({})
+    write_stats(stats, totals)
+    stats.replace_one({'_id': STATS_MARKER}, {'_id': STATS_MARKER, 'kind': 'version', 'version': STATS_VERSION}, upsert=True)
+    print(f"Statistiques recalculées: {len(totals)} agrégats")
+
+def ensure_stats(collection):
+    marker = collection.database[STATS_COLLECTION].find_one({'_id': STATS_MARKER})
+    if marker is None or marker.get('version') != STATS_VERSION:
+        rebuild_stats(collection)
+
+def find_changes(collection, batch):
+    previous = {
+        doc['link']: doc
+        for doc in collection.find(
+            {'link': {'$in': [article['link'] for article in batch]}},
+            {'_id': 0, 'link': 1, 'content_hash': 1, 'main_category': 1, 'author': 1, 'tags.name': 1, 'publish_datetime': 1}
+        )
+    }
+    suspect = [
+        article['link'] for article in batch
+        if article['link'] in previous and previous[article['link']].get('content_hash') != article['content_hash']
+    ]
+    projection = {'_id': 0, 'link': 1}
+    projection.update({field: 1 for field in HASHED_FIELDS})
+    full = {doc['link']: doc for doc in collection.find({'link': {'$in': suspect}}, projection)} if suspect else {}
+    return previous, full
+
+def write_batch(collection, batch, counts):
+    unique = {}
+    for article in batch:
+        if article['link'] in unique:
+            counts['unchanged'] += 1
+            continue
+        if not article.get('content_hash'):
+            article['content_hash'] = content_hash(article)
+        unique[article['link']] = article
+    batch = list(unique.values())
+    previous, full = find_changes(collection, batch)
+    
+    written = []
+    operations = []
+    revisions = []
+    for article in batch:
+        link = article['link']
+        if link in previous and previous[link].get('content_hash') == article['content_hash']:
+            counts['unchanged'] += 1
+            continue
         
-        if data:
-            for article in data:
-                existing = collection.find_one({"link": article['link']})
-                
-                if existing:
-                    collection.update_one(
-                        {"_id": existing['_id']},
-                        {"$set": article}
-                    )
-                    print({article['list_title']})
-                else:
-                    collection.insert_one(article)
-                    print({article['list_title']})
-            
-            print(f"{len(data)} articles")
+        old = full.get(link)
+        changes = diff_articles(old, article) if old is not None else None
+        if changes is not None and 'internal_links' not in old:
+            changes.pop('internal_links', None)
+        if changes == {}:
+            fields = {'content_hash': article['content_hash']}
+            if article.get('internal_links') and 'internal_links' not in old:
+                fields['internal_links'] = article['internal_links']
+                fields['date_scraped'] = article.get('date_scraped') or datetime.now()
+            operations.append(UpdateOne({"link": link}, {"$set": fields}))
+            written.append((article, 'backfilled' if 'internal_links' in fields else 'hashed'))
+            continue
+        
+        operations.append(UpdateOne({"link": link}, {"$set": article}, upsert=True))
+        written.append((article, 'updated' if link in previous else 'inserted'))
+        if old is not None:
+            revisions.append({
+                'link': link,
+                'source': article.get('source'),
+                'revised_at': article.get('date_scraped') or datetime.now(),
+                'previous_hash': previous[link].get('content_hash'),
+                'content_hash': article['content_hash'],
+                'changes': changes
+            })
+    
+    failed = set()
+    if operations:
+        try:
+            collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            failed = {error['index'] for error in e.details['writeErrors']}
+    
+    for i, (article, result) in enumerate(written):
+        if i in failed:
+            counts['errors'] += 1
+        elif result == 'hashed':
+            counts['unchanged'] += 1
+        elif result == 'backfilled':
+            counts['updated'] += 1
         else:
-            print("no data")
+            counts[result] += 1
+    
+    failed_links = {written[i][0]['link'] for i in failed}
+    revisions = [revision for revision in revisions if revision['link'] not in failed_links]
+    if revisions:
+        collection.database[REVISIONS_COLLECTION].insert_many(revisions, ordered=False)
+        metrics.inc('scraper_revisions_total', len(revisions))
+    
+    changed = [
+        article['link'] for article, result in written
+        if result not in ('hashed', 'backfilled') and article['link'] not in failed_links
+    ]
+    update_stats(collection, previous, batch, changed)
+    return [link for link in unique if link not in failed_links]
+
+class MongoSink:
+    STOP = object()
+
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, queue_size=QUEUE_SIZE, on_stored=None):
+        self.batch_size = batch_size
+        self.on_stored = on_stored
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'errors': 0}
+        self.collection = None
+        self.thread = threading.Thread(target=self.run, name="mongo-sink", daemon=True)
+
+    def start(self):
+        self.collection = get_collection()
+        ensure_indexes(self.collection)
+        self.thread.start()
+        return self
+
+    def put(self, article):
+        self.queue.put(article)
+        metrics.set('scraper_sink_queue_depth', self.queue.qsize())
+        metrics.maximum('scraper_sink_queue_depth_max', self.queue.qsize())
+
+    def flush(self, batch):
+        before = dict(self.counts)
+        start = time.perf_counter()
+        try:
+            stored = write_batch(self.collection, batch, self.counts)
+            if self.on_stored:
+                self.on_stored(stored)
+            print(f"Lot de {len(batch)} articles enregistré ({self.queue.qsize()} en attente)")
+        except Exception as e:
+            self.counts['errors'] += len(batch)
+            print(f"Erreur lors de l'enregistrement d'un lot de {len(batch)} articles: {e}")
+        
+        seconds = time.perf_counter() - start
+        deltas = {result: self.counts[result] - before[result] for result in self.counts}
+        metrics.observe('scraper_stage_seconds', seconds, stage='store')
+        for result, count in deltas.items():
+            metrics.inc('scraper_articles_stored_total', count, result=result)
+        metrics.set('scraper_sink_queue_depth', self.queue.qsize())
+        metrics.event('batch', size=len(batch), seconds=round(seconds, 4), queued=self.queue.qsize(), **deltas)
+
+    def run(self):
+        batch = []
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is self.STOP:
+                break
+            if item is not None:
+                batch.append(item)
             
+            if batch and (len(batch) >= self.batch_size or time.monotonic() - last_flush >= self.flush_interval):
+                self.flush(batch)
+                batch = []
+                last_flush = time.monotonic()
+            elif not batch:
+                last_flush = time.monotonic()
+        
+        if batch:
+            self.flush(batch)
+
+    def close(self):
+        self.queue.put(self.STOP)
+        self.thread.join()
+        return self.counts
+
+def store_in_mongodb(data, batch_size=BATCH_SIZE, on_stored=None):
+    try:
+        sink = MongoSink(batch_size, on_stored=on_stored).start()
     except Exception as e:
         print(f"{e}")
+        return {'inserted': 0, 'updated': 0, 'unchanged': 0, 'errors': 0}
+    
+    for article in data:
+        sink.put(article)
+    counts = sink.close()
+    
+    print(f"{counts['inserted']} articles ajoutés, {counts['updated']} mis à jour, "
+          f"{counts['unchanged']} inchangés, {counts['errors']} erreurs")
+    return counts
+
+def refresh_related(counts):
+    if not counts['inserted'] and not counts['updated']:
+        return
+    try:
+        with metrics.timer('scraper_stage_seconds', stage='related'):
+            related_index.refresh(get_collection().database)
+    except Exception as e:
+        print(f"Erreur lors de la mise à jour des articles similaires: {e}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scraping du Blog du Modérateur")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="nombre d'articles récupérés en parallèle")
+    parser.add_argument("--site", action="append", dest="sites",
+                        help="profil de site à parcourir (nom dans sites/ ou fichier JSON), répétable ; par défaut tous les profils de sites/")
+    parser.add_argument("--rate", type=float,
+                        help="requêtes par seconde autorisées par site (0 = illimité), remplace la valeur des profils")
+    parser.add_argument("--parse-workers", type=int, default=DEFAULT_PARSE_WORKERS,
+                        help="processus dédiés au parsing des articles (0 = parsing dans les threads de téléchargement)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="ignorer les articles déjà stockés et inchangés")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help="répertoire du cache HTTP (ETag/Last-Modified)")
+    parser.add_argument("--cache-size", type=int, default=CACHE_MAX_MB,
+                        help="taille maximale du cache HTTP en Mo")
+    parser.add_argument("--pages", type=int, default=1,
+                        help="nombre de pages parcourues par catégorie (0 = toutes)")
+    parser.add_argument("--since", type=lambda value: datetime.strptime(value, "%Y-%m-%d").date(),
+                        help="ignorer les articles publiés avant cette date (AAAA-MM-JJ)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="nombre d'articles écrits par requête MongoDB")
+    parser.add_argument("--store", action="store_true",
+                        help="enregistrer les articles dans MongoDB au fil du scraping, sans confirmation")
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL,
+                        help="délai maximal en secondes avant l'écriture d'un lot incomplet")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE,
+                        help="nombre maximal d'articles en attente d'écriture")
+    parser.add_argument("--resume", action="store_true",
+                        help="reprendre le dernier scraping là où il s'est arrêté")
+    parser.add_argument("--journal", default=JOURNAL_PATH,
+                        help="fichier SQLite du journal de progression")
+    parser.add_argument("--quiet", action="store_true",
+                        help="ne pas afficher le détail de chaque requête et de chaque article")
+    parser.add_argument("--log-json",
+                        help="fichier où ajouter les événements du scraping au format JSON lines")
+    parser.add_argument("--metrics-file",
+                        help="fichier où écrire les métriques au format Prometheus en fin d'exécution")
+    parser.add_argument("--metrics-port", type=int,
+                        help="exposer les métriques Prometheus sur http://127.0.0.1:PORT/metrics pendant le scraping")
+    parser.add_argument("--rebuild-stats", action="store_true",
+                        help="recalculer les statistiques agrégées à partir des articles stockés, puis quitter")
+    parser.add_argument("--no-related", action="store_true",
+                        help="ne pas mettre à jour l'index des articles similaires après l'enregistrement")
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.rebuild_stats:
+        rebuild_stats(get_collection())
+        raise SystemExit
+    
+    VERBOSE = not args.quiet
+    if args.log_json:
+        metrics.open_log(args.log_json)
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    sites = load_sites(args.sites)
+    if args.rate is not None:
+        rate_limiter.rate = args.rate
+    else:
+        for site in sites:
+            for host in site.hosts():
+                rate_limiter.set_rate(host, site.rate)
+    session = build_session(max(10, args.workers * len(sites)))
+    http_cache = HttpCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    known = load_known_articles() if args.incremental else None
+    journal = CrawlJournal(args.journal, resume=args.resume)
+    
+    start_parse_pool(args.parse_workers)
+    
+    sink = None
+    if args.store:
+        sink = MongoSink(args.batch_size, args.flush_interval, args.queue_size, journal.mark_stored).start()
+    
     start_time = datetime.now()
-    article_data = scrape_all_categories()
+    article_data = []
+    total = 0
+    category_counts = Counter()
+    try:
+        for article in iter_all_sites(sites, args.workers, known, args.pages, args.since, journal):
+            total += 1
+            if sink:
+                sink.put(article)
+            else:
+                article_data.append(article)
+            category_counts[article['main_category']] += 1
+    finally:
+        stop_parse_pool()
+        if sink:
+            store_counts = sink.close()
     end_time = datetime.now()
     duration = end_time - start_time
     
     print(f"\ {duration.total_seconds()} secondes")
-    print(f"total: {len(article_data)}")
-    
-    category_counts = {}
-    for article in article_data:
-        category = article['main_category']
-        if category in category_counts:
-            category_counts[category] += 1
-        else:
-            category_counts[category] = 1
+    print(f"total: {total}")
+    print(f"Requêtes HTTP: {fetch_stats.summary()}")
+    print(f"Journal: {journal.summary()}")
+    stages = metrics.stage_totals('scraper_stage_seconds')
+    print("Étapes: " + ", ".join(
+        f"{stage} {seconds:.2f}s ({count})" for stage, (count, seconds) in sorted(stages.items())
+    ))
     
     print("\nRésumé catégorie:")
     for category, count in category_counts.items():
         print(f"- {category}: {count} articles")
     
-    save_to_db = input("\nSauvegarder les données dans MongoDB? (o/n): ")
-    if save_to_db.lower() == 'o':
-        store_in_mongodb(article_data)
+    if sink:
+        print(f"\n{store_counts['inserted']} articles ajoutés, {store_counts['updated']} mis à jour, "
+              f"{store_counts['unchanged']} inchangés, {store_counts['errors']} erreurs")
+        print("Données sauvegardées")
+        if not args.no_related:
+            refresh_related(store_counts)
+    elif input("\nSauvegarder les données dans MongoDB? (o/n): ").lower() == 'o':
+        store_counts = store_in_mongodb(article_data, args.batch_size, journal.mark_stored)
         print("Données sauvegardées")
+        if not args.no_related:
+            refresh_related(store_counts)
     else:
-        print("Les données pas sauvegardées")
\ No newline at end of file
+        print("Les données pas sauvegardées")
+    
+    stages = metrics.stage_totals('scraper_stage_seconds')
+    metrics.set('scraper_run_seconds', duration.total_seconds())
+    metrics.event('run', seconds=duration.total_seconds(), articles=total, categories=dict(category_counts),
+                  stages={stage: round(seconds, 4) for stage, (_, seconds) in stages.items()})
+    metrics.close_log()
+    if args.metrics_file:
+        metrics.write_prometheus(args.metrics_file)
\ No newline at end of file
@@ -0,0 +1,226 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import resource
+import sys
+import time
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+import beautifulSoup4 as scraper
+
+ARCHIVE_DIR = os.path.join("fixtures", "corpus")
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        peak *= 1024
+    return round(peak / (1024 * 1024), 1)
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def timing_report(durations, items=None, total=None):
+    total = sum(durations) if total is None else total
+    items = len(durations) if items is None else items
+    return {
+        'calls': len(durations),
+        'items': items,
+        'seconds': round(total, 3),
+        'items_per_second': round(items / total, 2) if total else 0,
+        'p50_ms': round(percentile(durations, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(durations, 0.95) * 1000, 2),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def save_page(directory, kind, url, response, manifest):
+    name = f"{kind}/{hashlib.sha1(url.encode()).hexdigest()}.html"
+    with open(os.path.join(directory, name), "wb") as f:
+        f.write(response.content)
+    manifest[url] = {'file': name, 'kind': kind, 'content_type': response.headers.get('Content-Type', 'text/html')}
+
+def record(directory, site, pages, articles_per_category):
+    for kind in ("categories", "articles"):
+        os.makedirs(os.path.join(directory, kind), exist_ok=True)
+    manifest = {}
+    
+    for category in site.categories:
+        links = []
+        for page in range(1, pages + 1):
+            url = site.page_url(category['url'], page)
+            try:
+                response = scraper.fetch(url)
+            except Exception as e:
+                print(f"Arrêt de {category['name']} à la page {page}: {e}")
+                break
+            save_page(directory, "categories", url, response, manifest)
+            links.extend(entry['link'] for entry in scraper.parse_category_page(response.content, site))
+        
+        for link in links[:articles_per_category or None]:
+            try:
+                save_page(directory, "articles", link, scraper.fetch(link), manifest)
+            except Exception as e:
+                print(f"Article ignoré {link}: {e}")
+    
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({'site': site.name, 'pages': pages, 'recorded_at': time.strftime("%Y-%m-%dT%H:%M:%S"), 'urls': manifest}, f, indent=1)
+    print(f"{len(manifest)} pages enregistrées dans {directory}")
+
+class ReplayAdapter(BaseAdapter):
+    def __init__(self, directory, latency=0):
+        super().__init__()
+        self.directory = directory
+        self.latency = latency
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+    def send(self, request, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        entry = self.manifest['urls'].get(request.url)
+        response = Response()
+        response.url = request.url
+        response.request = request
+        response.headers = CaseInsensitiveDict()
+        if entry is None:
+            response.status_code = 404
+            response.reason = "Not Found"
+            response._content = b""
+        else:
+            with open(os.path.join(self.directory, entry['file']), "rb") as f:
+                response._content = f.read()
+            response.status_code = 200
+            response.reason = "OK"
+            response.headers['Content-Type'] = entry['content_type']
+        return response
+
+    def close(self):
+        pass
+
+def get_stand_in_collection(mongo):
+    if mongo == "memory":
+        import mongomock
+        return mongomock.MongoClient()["blog_scraper_benchmark"]["articles"]
+    import pymongo
+    return pymongo.MongoClient(mongo)["blog_scraper_benchmark"]["articles"]
+
+def benchmark_categories(site, workers, pages):
+    durations = []
+    records = []
+    for category in site.categories:
+        start = time.perf_counter()
+        records.extend(scraper.scrape_category_articles(category['url'], category['name'], workers, max_pages=pages, site=site))
+        durations.append(time.perf_counter() - start)
+    return records, timing_report(durations, items=len(records))
+
+def benchmark_articles(site, links):
+    durations = []
+    for link in links:
+        start = time.perf_counter()
+        scraper.scrape_article_content(link, site=site)
+        durations.append(time.perf_counter() - start)
+    return timing_report(durations)
+
+def benchmark_store(collection, records, batch_size):
+    collection.drop()
+    collection.database[scraper.STATS_COLLECTION].drop()
+    scraper.get_collection = lambda: collection
+    start = time.perf_counter()
+    scraper.store_in_mongodb(records, batch_size)
+    return timing_report([time.perf_counter() - start], items=len(records))
+
+def run(args):
+    with open(os.path.join(args.archive, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    pages = manifest['pages']
+    site = scraper.get_site(manifest.get('site'))
+    article_links = [url for url, entry in manifest['urls'].items() if entry['kind'] == "articles"]
+    
+    if args.parser:
+        scraper.PARSER = args.parser
+    scraper.rate_limiter.rate = 0
+    scraper.session = scraper.build_session(max(10, max(args.workers)))
+    adapter = ReplayAdapter(args.archive, args.latency / 1000)
+    scraper.session.mount("http://", adapter)
+    scraper.session.mount("https://", adapter)
+    
+    report = {
+        'archive': args.archive,
+        'site': site.name,
+        'pages_per_category': pages,
+        'parser': scraper.PARSER,
+        'parse_workers': args.parse_workers,
+        'latency_ms': args.latency,
+        'scrape_category_articles': {},
+        'scrape_article_content': None,
+        'store_in_mongodb': {}
+    }
+    
+    records = []
+    scraper.VERBOSE = False
+    scraper.start_parse_pool(args.parse_workers)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for workers in args.workers:
+            records, report['scrape_category_articles'][f"workers={workers}"] = benchmark_categories(site, workers, pages)
+        report['scrape_article_content'] = benchmark_articles(site, article_links)
+        
+        scraper.stop_parse_pool()
+        
+        collection = get_stand_in_collection(args.mongo)
+        for batch_size in args.batch_sizes:
+            report['store_in_mongodb'][f"batch_size={batch_size}"] = benchmark_store(collection, records, batch_size)
+        collection.drop()
+        collection.database[scraper.STATS_COLLECTION].drop()
+    
+    report['peak_rss_mb'] = peak_rss_mb()
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+def int_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne du scraper sur un corpus de pages enregistrées")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    record_parser = subparsers.add_parser("record", help="enregistrer un corpus de pages depuis le site")
+    record_parser.add_argument("--archive", default=ARCHIVE_DIR, help="répertoire du corpus")
+    record_parser.add_argument("--site", default=scraper.DEFAULT_SITE,
+                               help="profil de site à enregistrer (nom dans sites/ ou fichier JSON)")
+    record_parser.add_argument("--pages", type=int, default=1, help="pages enregistrées par catégorie")
+    record_parser.add_argument("--articles", type=int, default=0,
+                               help="articles enregistrés par catégorie (0 = tous)")
+    record_parser.add_argument("--rate", type=float, default=scraper.DEFAULT_RATE,
+                               help="requêtes par seconde pendant l'enregistrement")
+    
+    run_parser = subparsers.add_parser("run", help="rejouer le corpus et mesurer les performances")
+    run_parser.add_argument("--archive", default=ARCHIVE_DIR, help="répertoire du corpus")
+    run_parser.add_argument("--workers", type=int_list, default=[1, 4],
+                            help="nombres de workers à comparer, séparés par des virgules")
+    run_parser.add_argument("--batch-sizes", type=int_list, default=[100, 500],
+                            help="tailles de lot MongoDB à comparer, séparées par des virgules")
+    run_parser.add_argument("--latency", type=float, default=0,
+                            help="latence réseau simulée par requête, en millisecondes")
+    run_parser.add_argument("--parser", choices=["lxml", "html.parser"],
+                            help="forcer le parseur HTML")
+    run_parser.add_argument("--parse-workers", type=int, default=0,
+                            help="processus dédiés au parsing des articles (0 = dans les threads)")
+    run_parser.add_argument("--mongo", default="memory",
+                            help="'memory' (mongomock) ou URI d'un MongoDB local")
+    run_parser.add_argument("--output", help="fichier JSON de sortie")
+    
+    args = parser.parse_args()
+    if args.command == "record":
+        scraper.rate_limiter.rate = args.rate
+        record(args.archive, scraper.get_site(args.site), args.pages, args.articles)
+    else:
+        run(args)
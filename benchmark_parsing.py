@@ -0,0 +1,81 @@
+import argparse
+import contextlib
+import io
+import time
+import tracemalloc
+from bs4 import BeautifulSoup
+import beautifulSoup4 as scraper
+
+def current_path(content):
+    return BeautifulSoup(content.decode('utf-8', errors='replace'), 'html.parser')
+
+def strained_path(content, keep, schema):
+    return scraper.parse_html(content, keep), schema.scan(content)
+
+def measure(parse, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse()
+        timings.append(time.perf_counter() - start)
+    
+    tracemalloc.start()
+    soup = parse()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return soup, min(timings), peak
+
+def benchmark(paths, kind, repeat, site):
+    schema = site.article_schema if kind == "article" else site.listing_schema
+    keep = schema.keep if schema.roots is not None else None
+    extract = (lambda soup, scanned=None: scraper.extract_article(soup, site, scanned)) if kind == "article" else None
+    totals = {"current": [0, 0], "strained": [0, 0], "extraction": 0, "scan": 0}
+    
+    print(f"Parseur sélectionné: {scraper.PARSER}")
+    print(f"{'page':40} {'actuel (ms)':>12} {'filtré (ms)':>12} {'actuel (Ko)':>12} {'filtré (Ko)':>12} "
+          f"{'extraction (ms)':>16} {'liens (ms)':>11}  identique")
+    for path in paths:
+        with open(path, "rb") as f:
+            content = f.read()
+        
+        old_soup, old_time, old_peak = measure(lambda: current_path(content), repeat)
+        (new_soup, scanned), new_time, new_peak = measure(lambda: strained_path(content, keep, schema), repeat)
+        _, scan_time, _ = measure(lambda: schema.scan(content), repeat)
+        
+        same = "-"
+        extract_time = 0
+        if extract:
+            with contextlib.redirect_stdout(io.StringIO()):
+                same = "oui" if extract(old_soup) == extract(new_soup, scanned) else "NON"
+                _, extract_time, _ = measure(lambda: extract(new_soup, scanned), repeat)
+        
+        totals["current"][0] += old_time
+        totals["current"][1] += old_peak
+        totals["strained"][0] += new_time
+        totals["strained"][1] += new_peak
+        totals["extraction"] += extract_time
+        totals["scan"] += scan_time
+        print(f"{path[-40:]:40} {old_time * 1000:12.2f} {new_time * 1000:12.2f} "
+              f"{old_peak / 1024:12.0f} {new_peak / 1024:12.0f} {extract_time * 1000:16.2f} "
+              f"{scan_time * 1000:11.2f}  {same}")
+    
+    if paths:
+        count = len(paths)
+        old_time, old_peak = totals["current"]
+        new_time, new_peak = totals["strained"]
+        print(f"\nMoyenne par page: {old_time / count * 1000:.2f} ms -> {new_time / count * 1000:.2f} ms, "
+              f"{old_peak / count / 1024:.0f} Ko -> {new_peak / count / 1024:.0f} Ko, "
+              f"extraction {totals['extraction'] / count * 1000:.2f} ms, "
+              f"dont liens {totals['scan'] / count * 1000:.2f} ms dans le parsing filtré")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare le parsing actuel et le parsing filtré sur des pages sauvegardées")
+    parser.add_argument("pages", nargs="+", help="fichiers HTML sauvegardés")
+    parser.add_argument("--kind", choices=["article", "category"], default="article",
+                        help="type de page à analyser")
+    parser.add_argument("--site", default=scraper.DEFAULT_SITE,
+                        help="profil de site dont les schémas sont utilisés (nom dans sites/ ou fichier JSON)")
+    parser.add_argument("--repeat", type=int, default=5, help="nombre de répétitions par page")
+    args = parser.parse_args()
+    
+    benchmark(args.pages, args.kind, args.repeat, scraper.get_site(args.site))
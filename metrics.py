@@ -0,0 +1,145 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.log_file = None
+
+    def inc(self, name, value=1, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.gauges[key] = value
+
+    def maximum(self, name, value, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.gauges[key] = max(self.gauges.get(key, value), value)
+
+    def observe(self, name, seconds, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * len(BUCKETS), 'count': 0, 'sum': 0.0}
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['count'] += 1
+            histogram['sum'] += seconds
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def open_log(self, path):
+        self.log_file = open(path, "a", encoding="utf-8")
+
+    def event(self, kind, **fields):
+        if self.log_file is None:
+            return
+        fields = {'ts': datetime.now().isoformat(timespec='milliseconds'), 'event': kind, **fields}
+        line = json.dumps(fields, ensure_ascii=False, default=str)
+        with self.lock:
+            self.log_file.write(line + "\n")
+
+    def close_log(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+    def stage_totals(self, name):
+        totals = {}
+        with self.lock:
+            for (metric, key), histogram in self.histograms.items():
+                if metric != name:
+                    continue
+                stage = dict(key).get('stage', '')
+                count, seconds = totals.get(stage, (0, 0.0))
+                totals[stage] = (count + histogram['count'], seconds + histogram['sum'])
+        return totals
+
+    def to_prometheus(self):
+        lines = []
+        with self.lock:
+            families = {}
+            for (name, key), value in self.counters.items():
+                families.setdefault((name, 'counter'), []).append((key, value))
+            for (name, key), value in self.gauges.items():
+                families.setdefault((name, 'gauge'), []).append((key, value))
+            for (name, key), histogram in self.histograms.items():
+                families.setdefault((name, 'histogram'), []).append((key, dict(histogram, buckets=list(histogram['buckets']))))
+
+        for (name, kind), samples in sorted(families.items()):
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(samples, key=lambda sample: sample[0]):
+                if kind != 'histogram':
+                    lines.append(f"{name}{format_labels(key)} {value}")
+                    continue
+                for bound, count in zip(BUCKETS, value['buckets']):
+                    lines.append(f"{name}_bucket{format_labels(key, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{format_labels(key, [('le', '+Inf')])} {value['count']}")
+                lines.append(f"{name}_sum{format_labels(key)} {value['sum']:.6f}")
+                lines.append(f"{name}_count{format_labels(key)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(handle, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(temporary, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        return server
@@ -0,0 +1,59 @@
+import streamlit as st
+import pymongo
+import pandas as pd
+
+st.set_page_config(
+    page_title="Statistiques - Blog du Modérateur",
+    page_icon="📊",
+    layout="wide"
+)
+
+@st.cache_resource
+def get_database():
+    client = pymongo.MongoClient("mongodb://localhost:27017/")
+    return client["blog_scraper"]
+
+@st.cache_data(ttl=60)
+def get_stats(kind, limit=0):
+    cursor = get_database()["stats"].find({'kind': kind}, {'_id': 0, 'key': 1, 'count': 1})
+    if kind == 'week':
+        cursor = cursor.sort('key', 1)
+    else:
+        cursor = cursor.sort('count', -1).limit(limit)
+    return pd.DataFrame(list(cursor), columns=['key', 'count'])
+
+st.title("📊 Statistiques des articles")
+st.markdown("Agrégats mis à jour à chaque enregistrement des articles dans MongoDB.")
+
+categories = get_stats('category')
+
+if categories.empty:
+    st.error("Aucune statistique disponible. Enregistrez des articles ou lancez `python beautifulSoup4.py --rebuild-stats`.")
+    st.stop()
+
+top_n = st.sidebar.slider("Nombre d'auteurs et de tags affichés", 5, 50, 15)
+authors = get_stats('author', top_n)
+tags = get_stats('tag', top_n)
+weeks = get_stats('week')
+
+col1, col2, col3 = st.columns(3)
+col1.metric("Articles", int(categories['count'].sum()))
+col2.metric("Catégories", len(categories))
+col3.metric("Semaines couvertes", len(weeks))
+
+st.subheader("Articles par catégorie")
+st.bar_chart(categories.set_index('key')['count'])
+
+st.subheader("Articles publiés par semaine")
+if weeks.empty:
+    st.info("Aucune date de publication disponible.")
+else:
+    st.line_chart(weeks.set_index('key')['count'])
+
+col1, col2 = st.columns(2)
+with col1:
+    st.subheader(f"Top {top_n} auteurs")
+    st.bar_chart(authors.set_index('key')['count'])
+with col2:
+    st.subheader(f"Top {top_n} tags")
+    st.bar_chart(tags.set_index('key')['count'])
@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pymongo
+
+MONGO_URI = "mongodb://localhost:27017/"
+EXPORT_DIR = "export"
+STATE_FILE = "_export_state.json"
+BATCH_SIZE = 5000
+PARTITIONING = ['main_category', 'month']
+
+ARTICLES_SCHEMA = pa.schema([
+    ('link', pa.string()),
+    ('source', pa.string()),
+    ('list_title', pa.string()),
+    ('page_title', pa.string()),
+    ('summary', pa.string()),
+    ('author', pa.string()),
+    ('publish_date', pa.string()),
+    ('publish_datetime', pa.string()),
+    ('published_at', pa.timestamp('us', tz='UTC')),
+    ('category_url', pa.string()),
+    ('thumbnail', pa.string()),
+    ('content_hash', pa.string()),
+    ('date_scraped', pa.timestamp('us')),
+    ('tag_count', pa.int32()),
+    ('image_count', pa.int32()),
+    ('main_category', pa.string()),
+    ('month', pa.string())
+])
+
+TAGS_SCHEMA = pa.schema([
+    ('link', pa.string()),
+    ('date_scraped', pa.timestamp('us')),
+    ('position', pa.int32()),
+    ('name', pa.string()),
+    ('url', pa.string()),
+    ('data_tag', pa.string()),
+    ('main_category', pa.string()),
+    ('month', pa.string())
+])
+
+IMAGES_SCHEMA = pa.schema([
+    ('link', pa.string()),
+    ('date_scraped', pa.timestamp('us')),
+    ('position', pa.int32()),
+    ('url', pa.string()),
+    ('alt', pa.string()),
+    ('dimensions', pa.string()),
+    ('full_size_url', pa.string()),
+    ('caption', pa.string()),
+    ('main_category', pa.string()),
+    ('month', pa.string())
+])
+
+TABLES = {'articles': ARTICLES_SCHEMA, 'tags': TAGS_SCHEMA, 'images': IMAGES_SCHEMA}
+
+def present(value):
+    return value is not None and value == value
+
+def parse_datetime(value):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+def publication_month(article):
+    published = parse_datetime(article.get('publish_datetime'))
+    if published is None and isinstance(article.get('date_scraped'), datetime):
+        published = article['date_scraped']
+    return published.strftime('%Y-%m') if published else 'inconnu'
+
+def flatten(articles):
+    rows = {name: [] for name in TABLES}
+    for article in articles:
+        published = parse_datetime(article.get('publish_datetime'))
+        keys = {
+            'link': article['link'],
+            'date_scraped': article.get('date_scraped'),
+            'main_category': article.get('main_category') or 'Non catégorisé',
+            'month': publication_month(article)
+        }
+        tags = article.get('tags') or []
+        images = article.get('images') or []
+        rows['articles'].append({
+            **{field: article.get(field) for field in ARTICLES_SCHEMA.names},
+            **keys,
+            'published_at': published.astimezone(timezone.utc) if published and published.tzinfo else None,
+            'tag_count': len(tags),
+            'image_count': len(images)
+        })
+        for position, tag in enumerate(tags):
+            rows['tags'].append({**{field: tag.get(field) for field in TAGS_SCHEMA.names}, **keys, 'position': position})
+        for position, image in enumerate(images):
+            rows['images'].append({**{field: image.get(field) for field in IMAGES_SCHEMA.names}, **keys, 'position': position})
+    return {name: pa.Table.from_pylist(rows[name], schema=TABLES[name]) for name in TABLES}
+
+def write_tables(directory, tables, basename):
+    options = ds.ParquetFileFormat().make_write_options(compression='zstd')
+    for name, table in tables.items():
+        if not table.num_rows:
+            continue
+        ds.write_dataset(
+            table,
+            os.path.join(directory, name),
+            format='parquet',
+            file_options=options,
+            partitioning=PARTITIONING,
+            partitioning_flavor='hive',
+            basename_template=basename + "-{i}.parquet",
+            existing_data_behavior='overwrite_or_ignore'
+        )
+
+def load_state(directory):
+    try:
+        with open(os.path.join(directory, STATE_FILE), encoding="utf-8") as f:
+            state = json.load(f)
+        return datetime.fromisoformat(state['last_date_scraped'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+def save_state(directory, last_scraped):
+    with open(os.path.join(directory, STATE_FILE), "w", encoding="utf-8") as f:
+        json.dump({'last_date_scraped': last_scraped.isoformat(), 'exported_at': datetime.now().isoformat()}, f)
+
+def export(collection, directory=EXPORT_DIR, since=None, after=None, batch_size=BATCH_SIZE):
+    query = {}
+    if since:
+        query['date_scraped'] = {'$gte': since}
+    if after:
+        query['date_scraped'] = {'$gt': after}
+
+    os.makedirs(directory, exist_ok=True)
+    run = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+    collection.create_index('date_scraped')
+    cursor = collection.find(query, {'_id': 0}).sort('date_scraped', 1).batch_size(batch_size)
+    batch = []
+    exported = 0
+    last_scraped = after
+    part = 0
+    for article in cursor:
+        batch.append(article)
+        if len(batch) < batch_size:
+            continue
+        write_tables(directory, flatten(batch), f"part-{run}-{part:05d}")
+        exported += len(batch)
+        part += 1
+        last_scraped = batch[-1].get('date_scraped') or last_scraped
+        batch = []
+        print(f"{exported} articles exportés")
+
+    if batch:
+        write_tables(directory, flatten(batch), f"part-{run}-{part:05d}")
+        exported += len(batch)
+        last_scraped = batch[-1].get('date_scraped') or last_scraped
+    if isinstance(last_scraped, datetime):
+        save_state(directory, last_scraped)
+    print(f"Export terminé: {exported} articles dans {directory}")
+    return exported
+
+class ParquetStore:
+    def __init__(self, directory=EXPORT_DIR):
+        self.directory = directory
+        articles = self.read('articles')
+        if articles.empty:
+            self.articles = articles
+            self.tags = {}
+            self.images = {}
+            self.version = (0, None)
+            return
+
+        articles = articles.sort_values('date_scraped').drop_duplicates('link', keep='last')
+        self.articles = articles.sort_values(['main_category', 'publish_datetime'], ascending=[True, False])
+        self.articles = self.articles.set_index('link', drop=False)
+        last_scraped = self.articles['date_scraped'].max()
+        self.version = (len(self.articles), last_scraped.to_pydatetime() if present(last_scraped) else None)
+        self.tags = self.children('tags', ['name', 'url', 'data_tag'])
+        self.images = self.children('images', ['url', 'alt', 'dimensions', 'full_size_url', 'caption'])
+
+    def read(self, name):
+        path = os.path.join(self.directory, name)
+        if not os.path.isdir(path):
+            return pa.Table.from_pylist([], schema=TABLES[name]).to_pandas()
+        dataset = ds.dataset(path, format='parquet', partitioning='hive')
+        return dataset.to_table().to_pandas()
+
+    def children(self, name, fields):
+        rows = self.read(name)
+        if rows.empty:
+            return {}
+        current = self.articles[['link', 'date_scraped']].reset_index(drop=True)
+        rows = rows.merge(current, on=['link', 'date_scraped']).sort_values(['link', 'position'])
+        children = {}
+        for record in rows[['link'] + fields].to_dict('records'):
+            link = record.pop('link')
+            children.setdefault(link, []).append({key: value for key, value in record.items() if present(value)})
+        return children
+
+    def __len__(self):
+        return len(self.articles)
+
+    def document(self, row, full=True):
+        document = {key: value for key, value in row.items() if present(value)}
+        document['tags'] = self.tags.get(row['link'], [])
+        images = self.images.get(row['link'], [])
+        document['images'] = images if full else images[:1]
+        return document
+
+    def filter(self, query):
+        articles = self.articles
+        for field, value in query.items():
+            articles = articles[articles[field] == value]
+        return articles
+
+    def sidebar_stats(self):
+        if self.articles.empty:
+            return 0, {}, []
+        categories = self.articles['main_category'].value_counts().sort_index()
+        authors = sorted(author for author in self.articles['author'].dropna().unique() if author)
+        return len(self.articles), {category: int(count) for category, count in categories.items()}, authors
+
+    def count(self, query):
+        return len(self.filter(query))
+
+    def page(self, query, page, page_size):
+        rows = self.filter(query).iloc[(page - 1) * page_size:page * page_size]
+        return [self.document(row, full=False) for row in rows.to_dict('records')]
+
+    def by_links(self, links):
+        rows = self.articles.loc[[link for link in links if link in self.articles.index]]
+        return [self.document(row, full=False) for row in rows.to_dict('records')]
+
+    def get(self, link):
+        if link not in self.articles.index:
+            return None
+        return self.document(self.articles.loc[link].to_dict())
+
+    def documents(self):
+        return [self.document(row) for row in self.articles.to_dict('records')]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export des articles MongoDB en fichiers Parquet partitionnés")
+    parser.add_argument("--output", default=EXPORT_DIR, help="répertoire de l'export")
+    parser.add_argument("--since", type=lambda value: datetime.strptime(value, "%Y-%m-%d"),
+                        help="n'exporter que les articles scrapés depuis cette date (AAAA-MM-JJ)")
+    parser.add_argument("--full", action="store_true",
+                        help="supprimer l'export existant et tout réexporter")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="nombre d'articles lus et écrits par lot")
+    parser.add_argument("--mongo-uri", default=MONGO_URI, help="URI de connexion MongoDB")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.full:
+        for name in list(TABLES) + [STATE_FILE]:
+            path = os.path.join(args.output, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+
+    collection = pymongo.MongoClient(args.mongo_uri)["blog_scraper"]["articles"]
+    after = None if args.since or args.full else load_state(args.output)
+    if after:
+        print(f"Export incrémental des articles scrapés après {after}")
+    export(collection, args.output, since=args.since, after=after, batch_size=args.batch_size)
@@ -0,0 +1,229 @@
+import argparse
+import math
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pymongo
+from pymongo import ReplaceOne, UpdateOne
+
+from search_index import analyze
+
+MONGO_URI = "mongodb://localhost:27017/"
+RELATED_COLLECTION = "related"
+TAG_PAIRS_COLLECTION = "tag_pairs"
+STATE_ID = "__state__"
+VERSION = 2
+TOP_K = 5
+TAG_WEIGHT = 2.0
+LINK_BONUS = 0.2
+MAX_DF = 0.2
+MIN_SCORE = 0.05
+
+PROJECTION = {'_id': 0, 'link': 1, 'page_title': 1, 'list_title': 1, 'summary': 1,
+              'tags': 1, 'internal_links': 1, 'date_scraped': 1}
+
+def term_weight(term, frequency):
+    return TAG_WEIGHT if term.startswith('tag:') else 1 + math.log(frequency)
+
+def tag_key(tag):
+    return str(tag.get('data_tag') or tag.get('name') or '')
+
+def article_features(article):
+    features = Counter()
+    for tag in article.get('tags') or []:
+        if tag_key(tag):
+            features['tag:' + tag_key(tag)] = 1
+    text = f"{article.get('page_title') or ''} {article.get('summary') or ''}"
+    for _, term in analyze(text):
+        features[term] += 1
+    return features
+
+class RelatedIndex:
+    def __init__(self, articles, top_k=TOP_K):
+        self.top_k = top_k
+        self.articles = {article['link']: article for article in articles}
+        self.links = list(self.articles)
+        self.ids = {link: i for i, link in enumerate(self.links)}
+        self.vectors = {}
+        self.links_out = {}
+        self.links_in = {}
+
+        features = {link: article_features(article) for link, article in self.articles.items()}
+        document_frequency = Counter(term for terms in features.values() for term in terms)
+        count = len(features)
+        limit = max(50, MAX_DF * count)
+        postings = {}
+        for link, terms in features.items():
+            vector = {
+                term: term_weight(term, frequency) * math.log(count / document_frequency[term])
+                for term, frequency in terms.items()
+                if document_frequency[term] <= limit
+            }
+            norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+            vector = {term: weight / norm for term, weight in vector.items() if weight} if norm else {}
+            self.vectors[link] = vector
+            for term, weight in vector.items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(self.ids[link])
+                postings[term][1].append(weight)
+        self.postings = {
+            term: (np.array(ids, dtype=np.int32), np.array(weights, dtype=np.float64))
+            for term, (ids, weights) in postings.items()
+        }
+
+        for link, article in self.articles.items():
+            targets = [target for target in article.get('internal_links') or [] if target in self.articles and target != link]
+            self.links_out[link] = targets
+            for target in targets:
+                self.links_in.setdefault(target, []).append(link)
+
+    def scores(self, link):
+        vector = self.vectors.get(link)
+        if vector:
+            ids = np.concatenate([self.postings[term][0] for term in vector])
+            weights = np.concatenate([self.postings[term][1] * weight for term, weight in vector.items()])
+            scores = np.bincount(ids, weights, minlength=len(self.links))
+        else:
+            scores = np.zeros(len(self.links))
+        for other in self.links_out.get(link, []) + self.links_in.get(link, []):
+            scores[self.ids[other]] += LINK_BONUS
+        scores[self.ids[link]] = 0
+        return scores
+
+    def candidates(self, scores):
+        return {self.links[i]: float(scores[i]) for i in np.flatnonzero(scores >= MIN_SCORE)}
+
+    def reference(self, link):
+        article = self.articles[link]
+        return {'link': link, 'title': article.get('page_title') or article.get('list_title')}
+
+    def entry(self, link, score):
+        return dict(self.reference(link), score=round(score, 4))
+
+    def related(self, link, scores=None):
+        scores = self.scores(link) if scores is None else scores
+        if len(scores) > self.top_k:
+            best = np.argpartition(-scores, self.top_k)[:self.top_k]
+        else:
+            best = np.arange(len(scores))
+        best = sorted(best, key=lambda i: (-scores[i], self.links[i]))
+        return [self.entry(self.links[i], float(scores[i])) for i in best if scores[i] >= MIN_SCORE]
+
+    def document(self, link, related):
+        return {
+            '_id': link,
+            'related': related,
+            'links_out': [self.reference(target) for target in self.links_out.get(link, [])],
+            'links_in': [self.reference(source) for source in self.links_in.get(link, [])],
+            'updated_at': datetime.now()
+        }
+
+    def tag_pairs(self):
+        pairs = Counter()
+        names = {}
+        for article in self.articles.values():
+            tags = sorted({tag_key(tag) for tag in article.get('tags') or [] if tag_key(tag)})
+            for tag in article.get('tags') or []:
+                names.setdefault(tag_key(tag), tag.get('name'))
+            for i, first in enumerate(tags):
+                for second in tags[i + 1:]:
+                    pairs[(first, second)] += 1
+        return pairs, names
+
+def insert_related(entries, candidate, top_k):
+    if candidate['score'] < MIN_SCORE:
+        return entries
+    entries = sorted(entries + [candidate], key=lambda entry: entry['score'], reverse=True)
+    return entries[:top_k]
+
+def write_tag_pairs(database, index):
+    pairs, names = index.tag_pairs()
+    collection = database[TAG_PAIRS_COLLECTION]
+    stored = {doc['_id']: doc['count'] for doc in collection.find({}, {'count': 1})}
+    operations = []
+    for (first, second), count in pairs.items():
+        key = f"{first}|{second}"
+        if stored.pop(key, None) != count:
+            operations.append(UpdateOne({'_id': key}, {'$set': {
+                'tags': [first, second],
+                'names': [names.get(first), names.get(second)],
+                'count': count
+            }}, upsert=True))
+    if stored:
+        collection.delete_many({'_id': {'$in': list(stored)}})
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+    collection.create_index([('tags', 1), ('count', -1)])
+
+def refresh(database, full=False, top_k=TOP_K):
+    articles = database["articles"]
+    related = database[RELATED_COLLECTION]
+    state = related.find_one({'_id': STATE_ID}) or {}
+    since = None if full or state.get('version') != VERSION else state.get('refreshed_at')
+    started = datetime.now()
+
+    index = RelatedIndex(articles.find({}, PROJECTION), top_k)
+    if since is None:
+        dirty = set(index.articles)
+    else:
+        dirty = {link for link, article in index.articles.items()
+                 if isinstance(article.get('date_scraped'), datetime) and article['date_scraped'] > since}
+
+    documents = {}
+    touched = {}
+    for link in dirty:
+        scores = index.scores(link)
+        documents[link] = index.related(link, scores)
+        if since is not None:
+            for other, score in index.candidates(scores).items():
+                if other not in dirty:
+                    touched.setdefault(other, {})[link] = score
+
+    if since is not None:
+        affected = set(touched)
+        affected.update(target for link in dirty for target in index.links_out.get(link, []))
+        referencing = related.find(
+            {'$or': [{field: {'$in': list(dirty)}} for field in ('related.link', 'links_in.link', 'links_out.link')]},
+            {'_id': 1}
+        )
+        affected.update(doc['_id'] for doc in referencing)
+        affected = {link for link in affected - dirty if link in index.articles}
+
+        stored = {doc['_id']: doc for doc in related.find({'_id': {'$in': list(affected)}})}
+        for other in affected:
+            entries = stored[other]['related'] if other in stored else None
+            if entries is None or any(entry['link'] in dirty or entry['link'] not in index.articles for entry in entries):
+                entries = index.related(other)
+            else:
+                for link, score in touched.get(other, {}).items():
+                    entries = insert_related(entries, index.entry(link, score), top_k)
+
+            previous = stored.get(other, {})
+            document = index.document(other, entries)
+            if any(document[field] != previous.get(field) for field in ('related', 'links_in', 'links_out')):
+                documents[other] = entries
+
+    operations = [ReplaceOne({'_id': link}, index.document(link, entries), upsert=True) for link, entries in documents.items()]
+    if since is None:
+        related.delete_many({'_id': {'$nin': list(index.articles) + [STATE_ID]}})
+    if operations:
+        related.bulk_write(operations, ordered=False)
+    related.replace_one({'_id': STATE_ID}, {'_id': STATE_ID, 'refreshed_at': started, 'version': VERSION}, upsert=True)
+    related.create_index('related.link')
+    related.create_index('links_in.link')
+    related.create_index('links_out.link')
+    write_tag_pairs(database, index)
+    print(f"Articles similaires recalculés: {len(dirty)} modifiés, {len(documents)} mis à jour")
+    return len(documents)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Index des articles similaires et du graphe de liens")
+    parser.add_argument("--full", action="store_true", help="recalculer l'index pour tous les articles")
+    parser.add_argument("--top-k", type=int, default=TOP_K, help="nombre d'articles similaires par article")
+    parser.add_argument("--mongo-uri", default=MONGO_URI, help="URI de connexion MongoDB")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    refresh(pymongo.MongoClient(args.mongo_uri)["blog_scraper"], full=args.full, top_k=args.top_k)
@@ -0,0 +1,214 @@
+import math
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime
+from functools import lru_cache
+
+try:
+    import snowballstemmer
+    STEMMER = snowballstemmer.stemmer('french')
+except ImportError:
+    STEMMER = None
+
+SEARCH_FIELDS = ['page_title', 'list_title', 'summary', 'author']
+FIELD_GAP = 10
+K1 = 1.2
+B = 0.75
+REFRESH_INTERVAL = 60
+
+STOPWORDS = {
+    'a', 'au', 'aux', 'avec', 'ce', 'ces', 'd', 'dans', 'de', 'des', 'du', 'elle', 'en', 'est',
+    'et', 'il', 'j', 'l', 'la', 'le', 'les', 'leur', 'lui', 'm', 'ma', 'mais', 'me', 'mes', 'n',
+    'ne', 'nos', 'notre', 'nous', 'on', 'ou', 'par', 'pas', 'pour', 'qu', 'que', 'qui', 's', 'sa',
+    'se', 'ses', 'son', 'sur', 't', 'ta', 'te', 'un', 'une', 'vos', 'votre', 'vous', 'y'
+}
+
+LIGHT_SUFFIXES = [
+    'issements', 'issement', 'atrices', 'ateurs', 'ations', 'atrice', 'ateur', 'ation',
+    'ements', 'ement', 'ances', 'ance', 'ences', 'ence', 'ismes', 'isme', 'istes', 'iste',
+    'ables', 'able', 'iques', 'ique', 'euses', 'euse', 'ments', 'ment', 'ites', 'ite',
+    'ives', 'ive', 'eux', 'ifs', 'if', 'ees', 'ee', 'er', 'ez', 'es', 'e'
+]
+
+WORD = re.compile(r'\w+')
+QUERY_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+
+def fold_accents(text):
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+def light_stem(word):
+    if word.endswith('eaux'):
+        word = word[:-1]
+    elif len(word) > 4 and word.endswith('aux'):
+        word = word[:-3] + 'al'
+    elif len(word) > 3 and word[-1] in 'sx':
+        word = word[:-1]
+    for suffix in LIGHT_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+@lru_cache(maxsize=100000)
+def stem(word):
+    if fold_accents(word) in STOPWORDS:
+        return None
+    if STEMMER:
+        return fold_accents(STEMMER.stemWord(word))
+    return light_stem(fold_accents(word))
+
+def analyze(text):
+    terms = []
+    for position, word in enumerate(WORD.findall(text.lower())):
+        term = stem(word)
+        if term:
+            terms.append((position, term))
+    return terms
+
+def parse_query(query):
+    groups = [[]]
+    for phrase, word in QUERY_TOKEN.findall(query):
+        if word in ('OR', 'OU', '|'):
+            if groups[-1]:
+                groups.append([])
+            continue
+        if word in ('AND', 'ET', '&'):
+            continue
+        terms = analyze(phrase if phrase else word)
+        if terms:
+            groups[-1].append(terms)
+    return [group for group in groups if group]
+
+class SearchIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.postings = {}
+        self.doc_terms = {}
+        self.doc_lengths = {}
+        self.metadata = {}
+        self.total_length = 0
+        self.last_scraped = None
+        self.last_refresh = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def document_terms(self, doc):
+        texts = [doc.get(field) or '' for field in SEARCH_FIELDS]
+        texts.extend(tag.get('name', '') for tag in doc.get('tags') or [])
+
+        terms = []
+        offset = 0
+        for text in texts:
+            analyzed = analyze(text)
+            terms.extend((offset + position, term) for position, term in analyzed)
+            offset += (analyzed[-1][0] + 1 if analyzed else 0) + FIELD_GAP
+        return terms
+
+    def remove(self, link):
+        for term in self.doc_terms.pop(link, ()):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(link, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(link, 0)
+        self.metadata.pop(link, None)
+
+    def add(self, doc):
+        link = doc['link']
+        self.remove(link)
+
+        terms = self.document_terms(doc)
+        for position, term in terms:
+            self.postings.setdefault(term, {}).setdefault(link, []).append(position)
+        self.doc_terms[link] = {term for _, term in terms}
+        self.doc_lengths[link] = len(terms)
+        self.total_length += len(terms)
+        self.metadata[link] = (doc.get('main_category'), doc.get('author'))
+
+    def update(self, docs, replace=False):
+        with self.lock:
+            if replace:
+                self.clear()
+            for doc in docs:
+                self.add(doc)
+                scraped = doc.get('date_scraped')
+                if isinstance(scraped, datetime) and (self.last_scraped is None or scraped > self.last_scraped):
+                    self.last_scraped = scraped
+
+    def refresh(self, collection, force=False):
+        if not force and time.monotonic() - self.last_refresh < REFRESH_INTERVAL:
+            return
+        projection = {'_id': 0, 'link': 1, 'main_category': 1, 'date_scraped': 1, 'tags.name': 1}
+        projection.update({field: 1 for field in SEARCH_FIELDS})
+
+        if self.last_scraped is None or collection.estimated_document_count() < len(self):
+            self.update(list(collection.find({}, projection)), replace=True)
+        else:
+            self.update(list(collection.find({'date_scraped': {'$gte': self.last_scraped}}, projection)))
+        self.last_refresh = time.monotonic()
+
+    def phrase_matches(self, terms):
+        first_position, first_term = terms[0]
+        candidates = self.postings.get(first_term, {})
+        matches = set()
+        for link, positions in candidates.items():
+            for start in positions:
+                if all(start + position - first_position in self.postings.get(term, {}).get(link, ())
+                       for position, term in terms[1:]):
+                    matches.add(link)
+                    break
+        return matches
+
+    def clause_matches(self, terms):
+        if len(terms) > 1:
+            return self.phrase_matches(terms)
+        return set(self.postings.get(terms[0][1], ()))
+
+    def score(self, link, terms):
+        count = len(self.doc_lengths)
+        average_length = self.total_length / count if count else 0
+        length = self.doc_lengths[link]
+        total = 0.0
+        for term in terms:
+            postings = self.postings.get(term, {})
+            frequency = len(postings.get(link, ()))
+            if not frequency:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            norm = K1 * (1 - B + B * length / average_length) if average_length else K1
+            total += idf * frequency * (K1 + 1) / (frequency + norm)
+        return total
+
+    def search(self, query, category=None, author=None):
+        groups = parse_query(query)
+        if not groups:
+            return []
+
+        with self.lock:
+            matches = set()
+            for group in groups:
+                group_matches = None
+                for clause in sorted(group, key=lambda terms: len(self.postings.get(terms[0][1], ()))):
+                    clause_links = self.clause_matches(clause)
+                    group_matches = clause_links if group_matches is None else group_matches & clause_links
+                    if not group_matches:
+                        break
+                matches |= group_matches or set()
+
+            if category or author:
+                matches = {
+                    link for link in matches
+                    if (not category or self.metadata[link][0] == category)
+                    and (not author or self.metadata[link][1] == author)
+                }
+
+            terms = {term for group in groups for clause in group for _, term in clause}
+            ranked = sorted(((self.score(link, terms), link) for link in matches), reverse=True)
+        return [link for _, link in ranked]
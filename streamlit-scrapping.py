@@ -1,13 +1,14 @@
 import streamlit as st
 import pymongo
+import argparse
+import sys
 from datetime import datetime
 import pandas as pd
-import requests
-from io import BytesIO
-from PIL import Image
 import locale
 import re
 import hashlib
+from search_index import SearchIndex
+from thumbnails import ThumbnailCache
 
 
 def generate_article_key(article):
@@ -30,49 +31,262 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Explorateur d'articles")
+    parser.add_argument("--parquet", help="lire les articles depuis un export Parquet au lieu de MongoDB")
+    return parser.parse_known_args(sys.argv[1:])[0]
+
+ARGS = parse_args()
+
+@st.cache_resource(ttl=300)
+def get_parquet_store():
+    if not ARGS.parquet:
+        return None
+    from parquet_export import ParquetStore
+    return ParquetStore(ARGS.parquet)
+
 @st.cache_resource
 def get_database():
     client = pymongo.MongoClient("mongodb://localhost:27017/")
     return client["blog_scraper"]
 
-@st.cache_data(ttl=60)  
-def get_articles():
-    db = get_database()
-    collection = db["articles"]
-    articles = list(collection.find({}))
-    return articles
+ALL_CATEGORIES = "Toutes les catégories"
+ALL_AUTHORS = "Tous les auteurs"
+PAGE_SIZES = [10, 20, 50, 100]
+LIST_PROJECTION = {
+    '_id': 0,
+    'link': 1,
+    'list_title': 1,
+    'page_title': 1,
+    'thumbnail': 1,
+    'author': 1,
+    'publish_date': 1,
+    'summary': 1,
+    'main_category': 1,
+    'tags.name': 1,
+    'images': {'$slice': 1}
+}
+LIST_SORT = [('main_category', 1), ('publish_datetime', -1)]
 
-@st.cache_data
-def display_image(url):
-    if not url:
-        return None
-    try:
-        response = requests.get(url)
-        img = Image.open(BytesIO(response.content))
-        return img
-    except Exception as e:
-        st.warning(f"Impossible de charger l'image: {e}")
+@st.cache_data(ttl=60)
+def get_sidebar_stats():
+    store = get_parquet_store()
+    if store is not None:
+        return store.sidebar_stats()
+    
+    stats = get_database()["stats"]
+    categories = {doc['key']: doc['count'] for doc in stats.find({'kind': 'category'}).sort('key', 1)}
+    if categories and stats.find_one({'_id': '__version__'}):
+        authors = [doc['key'] for doc in stats.find({'kind': 'author'}, {'key': 1}).sort('key', 1)]
+        return sum(categories.values()), categories, authors
+    
+    collection = get_database()["articles"]
+    pipeline = [{'$facet': {
+        'total': [{'$count': 'count'}],
+        'categories': [
+            {'$group': {'_id': '$main_category', 'count': {'$sum': 1}}},
+            {'$sort': {'_id': 1}}
+        ],
+        'authors': [
+            {'$match': {'author': {'$nin': [None, '']}}},
+            {'$group': {'_id': '$author'}},
+            {'$sort': {'_id': 1}}
+        ]
+    }}]
+    result = next(collection.aggregate(pipeline))
+    total = result['total'][0]['count'] if result['total'] else 0
+    categories = {(c['_id'] or 'Non catégorisé'): c['count'] for c in result['categories']}
+    authors = [a['_id'] for a in result['authors']]
+    return total, categories, authors
+
+def build_query(category, author):
+    query = {}
+    if category != ALL_CATEGORIES:
+        query['main_category'] = category
+    if author != ALL_AUTHORS:
+        query['author'] = author
+    return query
+
+@st.cache_resource
+def get_search_index():
+    return SearchIndex()
+
+def search_articles(search_query, category, author):
+    index = get_search_index()
+    store = get_parquet_store()
+    if store is None:
+        index.refresh(get_database()["articles"])
+    elif (len(index), index.last_scraped) != store.version:
+        index.update(store.documents(), replace=True)
+    return index.search(
+        search_query,
+        category if category != ALL_CATEGORIES else None,
+        author if author != ALL_AUTHORS else None
+    )
+
+@st.cache_data(ttl=60)
+def count_articles(query):
+    store = get_parquet_store()
+    if store is not None:
+        return store.count(query)
+    return get_database()["articles"].count_documents(query)
+
+@st.cache_data(ttl=60)
+def get_articles(query, page, page_size):
+    store = get_parquet_store()
+    if store is not None:
+        return store.page(query, page, page_size)
+    collection = get_database()["articles"]
+    cursor = collection.find(query, LIST_PROJECTION).sort(LIST_SORT).skip((page - 1) * page_size).limit(page_size)
+    return list(cursor)
+
+@st.cache_data(ttl=60)
+def get_articles_by_links(links):
+    store = get_parquet_store()
+    if store is not None:
+        return store.by_links(links)
+    collection = get_database()["articles"]
+    order = {link: i for i, link in enumerate(links)}
+    articles = collection.find({'link': {'$in': list(links)}}, LIST_PROJECTION)
+    return sorted(articles, key=lambda article: order[article['link']])
+
+@st.cache_data(ttl=60)
+def get_article(link):
+    store = get_parquet_store()
+    if store is not None:
+        return store.get(link)
+    return get_database()["articles"].find_one({'link': link}, {'_id': 0})
+
+def get_revisions(link):
+    if get_parquet_store() is not None:
+        return []
+    return list(get_database()["revisions"].find({'link': link}, {'_id': 0}).sort('revised_at', -1).limit(20))
+
+@st.cache_data(ttl=60)
+def get_related(link):
+    if get_parquet_store() is not None:
         return None
+    return get_database()["related"].find_one({'_id': link}, {'_id': 0, 'updated_at': 0})
+
+def render_links(label, links):
+    if not links:
+        return
+    st.write(f"**{label}:**")
+    for entry in links[:10]:
+        st.write(f"- [{entry['title'] or entry['link']}]({entry['link']})")
+
+@st.cache_resource
+def get_thumbnail_cache():
+    return ThumbnailCache()
+
+def display_image(url):
+    return get_thumbnail_cache().get(url)
+
+def list_image_url(article):
+    if 'thumbnail' in article and article['thumbnail']:
+        return article['thumbnail']
+    if 'images' in article and article['images'] and len(article['images']) > 0:
+        return article['images'][0].get('url')
+    return None
+
+def render_article_details(link):
+    article = get_article(link)
+    if not article:
+        st.warning("Article introuvable dans la base de données.")
+        return
+    
+    with st.container():
+        st.markdown("### 📄 Détails complets de l'article")
+        st.markdown("---")
+        st.write("## Informations complètes")
+        st.write(f"**Titre complet:** {article.get('page_title', 'Non spécifié')}")
+        st.write(f"**Titre dans la liste:** {article.get('list_title', 'Non spécifié')}")
+        st.write(f"**URL de l'article:** {article.get('link', 'Non spécifiée')}")
+        
+        if 'images' in article and article['images']:
+            st.write("### Images")
+            image_paths = get_thumbnail_cache().prefetch(img.get('url') for img in article['images'])
+            for i, img in enumerate(article['images']):
+                cols = st.columns([1, 2])
+                with cols[0]:
+                    image_path = image_paths.get(img.get('url'))
+                    if image_path:
+                        st.image(image_path, width=200)
+                with cols[1]:
+                    st.write(f"**Légende:** {img.get('caption', 'Pas de légende')}")
+                    st.write(f"**Description:** {img.get('alt', 'Pas de description')}")
+                    if 'dimensions' in img:
+                        st.write(f"**Dimensions:** {img['dimensions']}")
+                    if 'full_size_url' in img:
+                        st.write(f"[Voir en taille réelle]({img['full_size_url']})")
+        
+        related = get_related(link)
+        if related and (related['related'] or related['links_out'] or related['links_in']):
+            st.write("### Articles similaires")
+            for entry in related['related']:
+                st.write(f"- [{entry['title'] or entry['link']}]({entry['link']}) ({entry['score']:.2f})")
+            render_links("Articles cités", related['links_out'])
+            render_links("Cité par", related['links_in'])
+        
+        revisions = get_revisions(link)
+        if revisions:
+            st.write("### Historique des modifications")
+            for revision in revisions:
+                st.write(f"**{revision['revised_at']:%d/%m/%Y %H:%M}** : {', '.join(revision['changes']) or 'aucun champ'}")
+                for field, change in revision['changes'].items():
+                    if 'old' in change:
+                        st.caption(f"{field} : « {change['old']} » → « {change['new']} »")
+                    elif change.get('reordered'):
+                        st.caption(f"{field} : ordre modifié")
+                    else:
+                        st.caption(f"{field} : {len(change['added'])} ajouté(s), {len(change['removed'])} supprimé(s)")
+
+def render_article(article):
+    with st.container():
+        col1, col2 = st.columns([1, 2])
+        
+        with col1:
+            image_path = display_image(list_image_url(article))
+            if image_path:
+                st.image(image_path, use_column_width=True)
+        
+        with col2:
+            st.markdown(f"### [{article.get('page_title', article.get('list_title', 'Sans titre'))}]({article.get('link', '#')})")
+            
+            st.write(f"**Auteur:** {article.get('author', 'Non spécifié')}")
+            st.write(f"**Date de publication:** {article.get('publish_date', 'Non spécifiée')}")
+            
+            if 'summary' in article and article['summary']:
+                st.write(f"**Résumé:** {article['summary']}")
+            
+            if 'tags' in article and article['tags']:
+                tags = [tag.get('name', '') for tag in article['tags'] if 'name' in tag]
+                if tags:
+                    st.write(f"**Tags:** {', '.join(tags)}")
+        
+        opened = st.session_state.setdefault('opened_articles', set())
+        link = article.get('link')
+        label = "Masquer les détails" if link in opened else "Voir plus de détails"
+        if st.button(label, key=generate_article_key(article)):
+            opened.symmetric_difference_update({link})
+            st.rerun()
+        
+        if link in opened:
+            render_article_details(link)
+        
+        st.markdown("---")
 
 st.title("📚 Explorateur d'articles du Blog du Modérateur")
 st.markdown("Découvrez tous les articles scrapés par catégories.")
 
-articles = get_articles()
+total_articles, categories, all_authors = get_sidebar_stats()
 
-if not articles:
+if not total_articles:
     st.error("Aucun article trouvé dans la base de données. Veuillez d'abord exécuter le scraping.")
     st.stop()
 
 st.sidebar.header("Statistiques")
-st.sidebar.write(f"📊 Nombre total d'articles: {len(articles)}")
-
-categories = {}
-for article in articles:
-    category = article.get('main_category', 'Non catégorisé')
-    if category in categories:
-        categories[category] += 1
-    else:
-        categories[category] = 1
+st.sidebar.write(f"📊 Nombre total d'articles: {total_articles}")
 
 st.sidebar.subheader("Catégories disponibles")
 for cat, count in categories.items():
@@ -82,166 +296,59 @@ st.sidebar.header("Filtres")
 
 selected_category = st.sidebar.selectbox(
     "Sélectionner une catégorie",
-    ["Toutes les catégories"] + list(categories.keys())
+    [ALL_CATEGORIES] + list(categories.keys())
 )
 
-search_query = st.sidebar.text_input("Rechercher des articles", "")
-
-all_authors = set()
-for article in articles:
-    if 'author' in article and article['author']:
-        all_authors.add(article['author'])
+search_query = st.sidebar.text_input(
+    "Rechercher des articles",
+    "",
+    help='Tous les mots sont requis. Utilisez OU (ou OR) pour une alternative et des "guillemets" pour une expression exacte.'
+)
 
 selected_author = st.sidebar.selectbox(
     "Filtrer par auteur",
-    ["Tous les auteurs"] + sorted(list(all_authors))
+    [ALL_AUTHORS] + all_authors
 )
 
-filtered_articles = articles
-if selected_category != "Toutes les catégories":
-    filtered_articles = [a for a in filtered_articles if a.get('main_category') == selected_category]
+if search_query.strip():
+    ranked_links = search_articles(search_query, selected_category, selected_author)
+    matching_count = len(ranked_links)
+else:
+    query = build_query(selected_category, selected_author)
+    matching_count = count_articles(query)
 
-if selected_author != "Tous les auteurs":
-    filtered_articles = [a for a in filtered_articles if a.get('author') == selected_author]
+page_size = st.sidebar.selectbox("Articles par page", PAGE_SIZES, index=1)
+page_count = max(1, -(-matching_count // page_size))
+filters_key = hashlib.md5(f"{selected_category}|{selected_author}|{search_query}|{page_size}".encode()).hexdigest()[:10]
+page = st.sidebar.number_input(f"Page (sur {page_count})", min_value=1, max_value=page_count, value=1, key=f"page_{filters_key}")
 
-if search_query:
-    search_terms = search_query.lower().split()
-    temp_articles = []
-    for article in filtered_articles:
-        article_text = (
-            f"{article.get('page_title', '')} {article.get('list_title', '')} "
-            f"{article.get('summary', '')} {article.get('author', '')}"
-        ).lower()
-        
-        if 'tags' in article and article['tags']:
-            for tag in article['tags']:
-                if 'name' in tag:
-                    article_text += f" {tag['name'].lower()}"
-        
-        if any(term in article_text for term in search_terms):
-            temp_articles.append(article)
-    filtered_articles = temp_articles
+if search_query.strip():
+    start = (page - 1) * page_size
+    filtered_articles = get_articles_by_links(tuple(ranked_links[start:start + page_size]))
+else:
+    filtered_articles = get_articles(query, page, page_size)
+
+st.write(f"### {matching_count} articles correspondent à vos critères")
 
-st.write(f"### {len(filtered_articles)} articles correspondent à vos critères")
+get_thumbnail_cache().prefetch(list_image_url(article) for article in filtered_articles)
 
 if not filtered_articles:
     st.warning("Aucun article ne correspond aux critères de recherche.")
+elif selected_category == ALL_CATEGORIES:
+    articles_by_cat = {}
+    for article in filtered_articles:
+        cat = article.get('main_category', 'Non catégorisé')
+        if cat not in articles_by_cat:
+            articles_by_cat[cat] = []
+        articles_by_cat[cat].append(article)
+    
+    for cat, cat_articles in articles_by_cat.items():
+        with st.expander(f"{cat} ({len(cat_articles)} articles sur cette page)", expanded=True):
+            for article in cat_articles:
+                render_article(article)
 else:
-    if selected_category == "Toutes les catégories":
-        articles_by_cat = {}
-        for article in filtered_articles:
-            cat = article.get('main_category', 'Non catégorisé')
-            if cat not in articles_by_cat:
-                articles_by_cat[cat] = []
-            articles_by_cat[cat].append(article)
-        
-        for cat, cat_articles in articles_by_cat.items():
-            with st.expander(f"{cat} ({len(cat_articles)} articles)", expanded=True):
-                for article in cat_articles:
-                    with st.container():
-                        col1, col2 = st.columns([1, 2])
-                        
-                        with col1:
-                            if 'thumbnail' in article and article['thumbnail']:
-                                st.image(article['thumbnail'], use_column_width=True)
-                            elif 'images' in article and article['images'] and len(article['images']) > 0:
-                                img_url = article['images'][0].get('url')
-                                if img_url:
-                                    st.image(img_url, use_column_width=True)
-                        
-                        with col2:
-                            st.markdown(f"### [{article.get('page_title', article.get('list_title', 'Sans titre'))}]({article.get('link', '#')})")
-                            
-                            st.write(f"**Auteur:** {article.get('author', 'Non spécifié')}")
-                            st.write(f"**Date de publication:** {article.get('publish_date', 'Non spécifiée')}")
-                            
-                            if 'summary' in article and article['summary']:
-                                st.write(f"**Résumé:** {article['summary']}")
-                            
-                            if 'tags' in article and article['tags']:
-                                tags = [tag.get('name', '') for tag in article['tags'] if 'name' in tag]
-                                if tags:
-                                    st.write(f"**Tags:** {', '.join(tags)}")
-                        
-                        if st.button(f"Voir plus de détails", key=generate_article_key(article)):
-                            with st.container():
-                                st.markdown("### 📄 Détails complets de l'article")
-                                st.markdown("---")
-                                st.write("## Informations complètes")
-                                st.write(f"**Titre complet:** {article.get('page_title', 'Non spécifié')}")
-                                st.write(f"**Titre dans la liste:** {article.get('list_title', 'Non spécifié')}")
-                                st.write(f"**URL de l'article:** {article.get('link', 'Non spécifiée')}")
-                                
-                                if 'images' in article and article['images']:
-                                    st.write("### Images")
-                                    for i, img in enumerate(article['images']):
-                                        cols = st.columns([1, 2])
-                                        with cols[0]:
-                                            img_url = img.get('url', '')
-                                            if img_url:
-                                                st.image(img_url, width=200)
-                                        with cols[1]:
-                                            st.write(f"**Légende:** {img.get('caption', 'Pas de légende')}")
-                                            st.write(f"**Description:** {img.get('alt', 'Pas de description')}")
-                                            if 'dimensions' in img:
-                                                st.write(f"**Dimensions:** {img['dimensions']}")
-                                            if 'full_size_url' in img:
-                                                st.write(f"[Voir en taille réelle]({img['full_size_url']})")
-                        
-                        st.markdown("---")
-    else:
-        for article in filtered_articles:
-            with st.container():
-                col1, col2 = st.columns([1, 2])
-                
-                with col1:
-                    if 'thumbnail' in article and article['thumbnail']:
-                        st.image(article['thumbnail'], use_column_width=True)
-                    elif 'images' in article and article['images'] and len(article['images']) > 0:
-                        img_url = article['images'][0].get('url')
-                        if img_url:
-                            st.image(img_url, use_column_width=True)
-                
-                with col2:
-                    st.markdown(f"### [{article.get('page_title', article.get('list_title', 'Sans titre'))}]({article.get('link', '#')})")
-                    
-                    st.write(f"**Auteur:** {article.get('author', 'Non spécifié')}")
-                    st.write(f"**Date de publication:** {article.get('publish_date', 'Non spécifiée')}")
-                    
-                    if 'summary' in article and article['summary']:
-                        st.write(f"**Résumé:** {article['summary']}")
-                    
-                    if 'tags' in article and article['tags']:
-                        tags = [tag.get('name', '') for tag in article['tags'] if 'name' in tag]
-                        if tags:
-                            st.write(f"**Tags:** {', '.join(tags)}")
-                
-                if st.button(f"Voir plus de détails", key=generate_article_key(article)):
-                    with st.container():
-                        st.markdown("### 📄 Détails complets de l'article")
-                        st.markdown("---")
-                        st.write("## Informations complètes")
-                        st.write(f"**Titre complet:** {article.get('page_title', 'Non spécifié')}")
-                        st.write(f"**Titre dans la liste:** {article.get('list_title', 'Non spécifié')}")
-                        st.write(f"**URL de l'article:** {article.get('link', 'Non spécifiée')}")
-                        
-                        if 'images' in article and article['images']:
-                            st.write("### Images")
-                            for i, img in enumerate(article['images']):
-                                cols = st.columns([1, 2])
-                                with cols[0]:
-                                    img_url = img.get('url', '')
-                                    if img_url:
-                                        st.image(img_url, width=200)
-                                with cols[1]:
-                                    st.write(f"**Légende:** {img.get('caption', 'Pas de légende')}")
-                                    st.write(f"**Description:** {img.get('alt', 'Pas de description')}")
-                                    if 'dimensions' in img:
-                                        st.write(f"**Dimensions:** {img['dimensions']}")
-                                    if 'full_size_url' in img:
-                                        st.write(f"[Voir en taille réelle]({img['full_size_url']})")
-                
-                st.markdown("---")
+    for article in filtered_articles:
+        render_article(article)
 
 st.sidebar.markdown("---")
 st.sidebar.info("""
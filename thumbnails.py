@@ -0,0 +1,161 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import requests
+from PIL import Image, features
+
+CACHE_DIR = ".thumbnail_cache"
+CACHE_MAX_MB = 200
+THUMBNAIL_SIZE = (480, 480)
+QUALITY = 80
+WORKERS = 8
+TIMEOUT = (5, 15)
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+RETRY_FAILED_AFTER = 600
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+if features.check('webp'):
+    FORMAT, EXTENSION = 'WEBP', 'webp'
+else:
+    FORMAT, EXTENSION = 'JPEG', 'jpg'
+
+THUMBNAIL_NAME = re.compile(r'^[0-9a-f]{64}-\d+x\d+\.(webp|jpg)$')
+
+class ThumbnailCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024, size=THUMBNAIL_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = size
+        self.lock = threading.Lock()
+        self.total = None
+        self.failed = {}
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        os.makedirs(os.path.join(directory, "refs"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "tmp"), exist_ok=True)
+
+    def ref_path(self, url):
+        return os.path.join(self.directory, "refs", hashlib.sha1(url.encode()).hexdigest())
+
+    def thumbnail_path(self, digest):
+        return os.path.join(self.directory, f"{digest}-{self.size[0]}x{self.size[1]}.{EXTENSION}")
+
+    def lookup(self, url):
+        try:
+            with open(self.ref_path(url), encoding="utf-8") as f:
+                path = self.thumbnail_path(f.read().strip())
+            os.utime(path)
+            return path
+        except OSError:
+            return None
+
+    def download(self, url):
+        with self.session.get(url, timeout=TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            content = BytesIO()
+            for chunk in response.iter_content(64 * 1024):
+                content.write(chunk)
+                if content.tell() > MAX_IMAGE_BYTES:
+                    raise ValueError(f"image trop volumineuse ({url})")
+            return content.getvalue()
+
+    def render(self, data):
+        image = Image.open(BytesIO(data))
+        image.thumbnail(self.size)
+        if FORMAT == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB' if FORMAT == 'JPEG' else 'RGBA')
+        output = BytesIO()
+        image.save(output, FORMAT, quality=QUALITY)
+        return output.getvalue()
+
+    def write(self, path, data):
+        handle, temporary = tempfile.mkstemp(dir=os.path.join(self.directory, "tmp"))
+        with os.fdopen(handle, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+    def get(self, url):
+        if not url:
+            return None
+        path = self.lookup(url)
+        if path:
+            return path
+        if time.monotonic() - self.failed.get(url, -RETRY_FAILED_AFTER) < RETRY_FAILED_AFTER:
+            return None
+
+        try:
+            data = self.download(url)
+            digest = hashlib.sha256(data).hexdigest()
+            path = self.thumbnail_path(digest)
+            added = 0
+            if not os.path.exists(path):
+                thumbnail = self.render(data)
+                self.write(path, thumbnail)
+                added = len(thumbnail)
+            self.write(self.ref_path(url), digest.encode())
+        except Exception as e:
+            print(f"Impossible de générer la miniature de {url}: {e}")
+            self.failed[url] = time.monotonic()
+            return None
+
+        self.added(added)
+        return path
+
+    def prefetch(self, urls):
+        urls = list(dict.fromkeys(url for url in urls if url))
+        with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+            return dict(zip(urls, executor.map(self.get, urls)))
+
+    def thumbnails(self):
+        for entry in os.scandir(self.directory):
+            if THUMBNAIL_NAME.match(entry.name) and entry.is_file():
+                yield entry
+
+    def added(self, size):
+        with self.lock:
+            if self.total is None:
+                self.total = sum(entry.stat().st_size for entry in self.thumbnails())
+            else:
+                self.total += size
+            if self.total > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        files = []
+        for entry in self.thumbnails():
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        self.total = sum(size for _, size, _ in files)
+        removed = False
+        for _, size, path in sorted(files):
+            if self.total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            removed = True
+            self.total -= size
+        if removed:
+            self.prune_refs()
+
+    def prune_refs(self):
+        for entry in os.scandir(os.path.join(self.directory, "refs")):
+            try:
+                with open(entry.path, encoding="utf-8") as f:
+                    digest = f.read().strip()
+            except OSError:
+                continue
+            if not os.path.exists(self.thumbnail_path(digest)):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass